@@ -121,13 +121,10 @@ def get_planet(bottom_color , top_color):
     min_y = np.min(positions_reshaped[:, 1])
     max_y = np.max(positions_reshaped[:, 1])
 
-    colors = []
-    for vertex in positions_reshaped:
-        y = vertex[1]
-        t = (y - min_y) / (max_y - min_y) if max_y != min_y else 0.0
-        color = bottom_color * (1 - t) + top_color * t
-        colors.extend(list(color) + [1.0])
-    colors = np.array(colors, dtype=np.float32)
+    # Vertical gradient from bottom_color to top_color
+    t = (positions_reshaped[:, 1:2] - min_y) / (max_y - min_y) if max_y != min_y else np.zeros((len(positions_reshaped), 1))
+    colors = np.hstack([np.asarray(bottom_color) * (1 - t) + np.asarray(top_color) * t, np.ones_like(t)])
+    colors = colors.astype(np.float32).ravel()
 
     planet_properties = {
         'positions': positions,  
@@ -233,15 +230,10 @@ def get_transporter():
     dark_grey = np.array([0.2, 0.2, 0.2], dtype=np.float32)
     light_grey = np.array([0.7, 0.7, 0.7], dtype=np.float32)
     
-    colors = []
-    for vertex in positions_reshaped:
-        y = vertex[1]
-        # Interpolation factor based on Y (if max_y==min_y, t defaults to 0).
-        t = (y - min_y) / (max_y - min_y) if max_y != min_y else 0.0
-        # Interpolate between dark_grey and light_grey.
-        col = dark_grey * (1 - t) + light_grey * t
-        colors.extend([col[0], col[1], col[2], 1.0])
-    colors = np.array(colors, dtype=np.float32)
+    # Interpolation factor based on Y (if max_y==min_y, t defaults to 0).
+    t = (positions_reshaped[:, 1:2] - min_y) / (max_y - min_y) if max_y != min_y else np.zeros((len(positions_reshaped), 1))
+    # Interpolate between dark_grey and light_grey.
+    colors = np.hstack([dark_grey * (1 - t) + light_grey * t, np.ones_like(t)]).astype(np.float32).ravel()
 
     
     transporter_properties = {
@@ -325,13 +317,7 @@ def get_laser():
     min_y = np.min(positions_reshaped[:, 1])
     max_y = np.max(positions_reshaped[:, 1])
 
-    colors = []
-    for vertex in positions_reshaped:
-        y = vertex[1]
-        t = (y - min_y) / (max_y - min_y) if max_y != min_y else 0.0
-        color = np.array([1.0, 0.66, 0.0], dtype=np.float32)
-        colors.extend(list(color) + [1.0])
-    colors = np.array(colors, dtype=np.float32)
+    colors = np.tile(np.array([1.0, 0.66, 0.0, 1.0], dtype=np.float32), len(positions_reshaped))
 
     planet_properties = {
         'positions': positions,  
@@ -1,6 +1,78 @@
 ######################################################
 # Write other shaders for minimap and crosshair (Since they need orthographic projection)
 
+# Minimap blips: rendered into the minimap texture with an orthographic projection
+minimap_shader = {
+    "vertex_shader" : '''
+        #version 330 core
+        layout(location = 0) in vec3 inPosition;   // map plane position, relative to the transporter
+        layout(location = 1) in vec4 inColor;
+        layout(location = 2) in float inSize;
+
+        uniform mat4 projectionMatrix;             // orthographic, covers the minimap range
+
+        out vec4 blipColor;
+
+        void main(){
+            gl_Position = projectionMatrix * vec4(inPosition.xy, 0.0, 1.0);
+            gl_PointSize = inSize;
+            blipColor = inColor;
+        }
+    ''',
+
+    "fragment_shader" : '''
+        #version 330 core
+        in vec4 blipColor;
+        out vec4 outputColor;
+
+        void main(){
+            // Round blips
+            if (length(gl_PointCoord - vec2(0.5)) > 0.5)
+                discard;
+            outputColor = blipColor;
+        }
+    '''
+}
+
+# Screen-space textured quad, used to composite cached render targets (minimap, scaled scene)
+quad_shader = {
+    "vertex_shader" : '''
+        #version 330 core
+        uniform vec4 rect;   // x, y, width, height in normalized device coordinates
+
+        out vec2 texCoord;
+
+        void main(){
+            // Two triangles from gl_VertexID, no vertex buffer needed
+            vec2 corners[6] = vec2[](vec2(0, 0), vec2(1, 0), vec2(1, 1), vec2(0, 0), vec2(1, 1), vec2(0, 1));
+            vec2 corner = corners[gl_VertexID];
+            texCoord = corner;
+            gl_Position = vec4(rect.xy + corner * rect.zw, 0.0, 1.0);
+        }
+    ''',
+
+    "fragment_shader" : '''
+        #version 330 core
+        in vec2 texCoord;
+        out vec4 outputColor;
+
+        uniform sampler2D image;
+        uniform int circular;   // 1: clip to a disc and draw a rim, for the minimap
+
+        void main(){
+            vec4 color = texture(image, texCoord);
+            if (circular == 1) {
+                float r = length(texCoord - vec2(0.5)) * 2.0;
+                if (r > 1.0)
+                    discard;
+                if (r > 0.97)
+                    color = vec4(0.6, 0.8, 1.0, 0.9);
+            }
+            outputColor = color;
+        }
+    '''
+}
+
 ######################################################
 # Lighting shader with vertex normals for metallic shading
 
@@ -16,6 +88,11 @@ lighting_shader = {
         uniform mat4 modelMatrix;
         uniform mat4 viewMatrix;
         uniform mat4 projectionMatrix;
+
+        // Palette meshes (planets) store a gradient factor in inColor.r, the two colors are per object
+        uniform int usePalette;
+        uniform vec3 paletteBottom;
+        uniform vec3 paletteTop;
         
         // Outputs to fragment shader
         out vec4 vertColor;
@@ -30,6 +107,8 @@ lighting_shader = {
             
             // Pass along the per-vertex color
             vertColor = inColor;
+            if (usePalette == 1)
+                vertColor = vec4(mix(paletteBottom, paletteTop, inColor.r), inColor.a);
             // Transform the normal to world space (assuming uniform scaling)
             vertNormal = normalize(mat3(modelMatrix) * inNormal);
             // Pass the world-space position for lighting calculations
@@ -75,6 +154,174 @@ lighting_shader = {
     '''
 }
 
+# Cheaper shading tiers with the same inputs and uniforms as lighting_shader, so an object
+# can switch between them without any other change.
+
+# Per-vertex (Gouraud) lighting: the fragment shader only interpolates the lit color
+lighting_vertex_shader = {
+    "vertex_shader" : '''
+        #version 330 core
+        layout(location = 0) in vec3 inPosition;
+        layout(location = 1) in vec4 inColor;
+        layout(location = 2) in vec3 inNormal;
+
+        uniform mat4 modelMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 projectionMatrix;
+
+        uniform int usePalette;
+        uniform vec3 paletteBottom;
+        uniform vec3 paletteTop;
+
+        uniform vec3 lightPos;
+        uniform vec3 viewPos;
+        uniform float ambientStrength;
+        uniform float specularStrength;
+        uniform float shininess;
+
+        out vec3 litColor;
+
+        void main(){
+            vec4 worldPos = modelMatrix * vec4(inPosition, 1.0);
+            gl_Position = projectionMatrix * viewMatrix * worldPos;
+
+            vec3 color = inColor.rgb;
+            if (usePalette == 1)
+                color = mix(paletteBottom, paletteTop, inColor.r);
+            // Same Blinn-Phong terms as lighting_shader, once per vertex
+            vec3 norm = normalize(mat3(modelMatrix) * inNormal);
+            vec3 lightDir = normalize(lightPos - worldPos.xyz);
+            vec3 viewDir = normalize(viewPos - worldPos.xyz);
+            vec3 halfwayDir = normalize(lightDir + viewDir);
+            float diff = max(dot(norm, lightDir), 0.0);
+            float spec = pow(max(dot(norm, halfwayDir), 0.0), shininess);
+            litColor = ambientStrength * color + diff * color + specularStrength * spec * vec3(1.0);
+        }
+    ''',
+
+    "fragment_shader" : '''
+        #version 330 core
+        in vec3 litColor;
+        out vec4 outputColor;
+
+        void main(){
+            outputColor = vec4(litColor, 1.0);
+        }
+    '''
+}
+
+# Unlit: the vertex color scaled by ambient plus the diffuse term averaged over all directions
+unlit_shader = {
+    "vertex_shader" : '''
+        #version 330 core
+        layout(location = 0) in vec3 inPosition;
+        layout(location = 1) in vec4 inColor;
+
+        uniform mat4 modelMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 projectionMatrix;
+
+        uniform int usePalette;
+        uniform vec3 paletteBottom;
+        uniform vec3 paletteTop;
+        uniform float ambientStrength;
+
+        out vec3 flatColor;
+
+        void main(){
+            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(inPosition, 1.0);
+            vec3 color = inColor.rgb;
+            if (usePalette == 1)
+                color = mix(paletteBottom, paletteTop, inColor.r);
+            flatColor = (ambientStrength + 0.25) * color;
+        }
+    ''',
+
+    "fragment_shader" : '''
+        #version 330 core
+        in vec3 flatColor;
+        out vec4 outputColor;
+
+        void main(){
+            outputColor = vec4(flatColor, 1.0);
+        }
+    '''
+}
+
+# Occlusion query boxes: a unit cube stretched over an object's bounding box, depth tested only
+occlusion_shader = {
+    "vertex_shader" : '''
+        #version 330 core
+        layout(location = 0) in vec3 inPosition;   // corner of the unit cube
+
+        uniform mat4 boxMatrix;                    // model matrix times the box min / size
+        uniform mat4 viewMatrix;
+        uniform mat4 projectionMatrix;
+
+        void main(){
+            gl_Position = projectionMatrix * viewMatrix * boxMatrix * vec4(inPosition, 1.0);
+        }
+    ''',
+
+    "fragment_shader" : '''
+        #version 330 core
+        out vec4 outputColor;
+
+        void main(){
+            outputColor = vec4(1.0);
+        }
+    '''
+}
+
+######################################################
+# Starfield shader: one point sprite per star, drawn behind everything in a single call.
+# Layer 0 is the sky sphere (rotation only); other layers wrap around the camera for parallax.
+
+star_shader = {
+    "vertex_shader" : '''
+        #version 330 core
+        layout(location = 0) in vec3 inPosition;
+        layout(location = 1) in vec4 inColor;
+        layout(location = 2) in float inSize;
+        layout(location = 3) in float inLayer;
+
+        uniform mat4 viewMatrix;        // Rotation only, the stars never translate with the camera
+        uniform mat4 projectionMatrix;
+        uniform vec3 layerOffset[4];    // Camera position scaled by the layer parallax, wrapped on the CPU
+        uniform float layerExtent[4];   // Size of the wrapping cube, 0.0 for the sky sphere
+
+        out vec4 starColor;
+
+        void main(){
+            int layer = int(inLayer);
+            vec3 p = inPosition;
+            float size = inSize;
+            if (layerExtent[layer] > 0.0) {
+                float extent = layerExtent[layer];
+                p = mod(p - layerOffset[layer] + 0.5 * extent, extent) - 0.5 * extent;
+                // Nearby stars grow a little, far ones shrink, to sell the depth
+                size *= clamp(0.25 * extent / max(length(p), 1.0), 0.5, 2.0);
+            }
+            gl_Position = projectionMatrix * viewMatrix * vec4(p, 1.0);
+            gl_PointSize = size;
+            starColor = inColor;
+        }
+    ''',
+
+    "fragment_shader" : '''
+        #version 330 core
+        in vec4 starColor;
+        out vec4 outputColor;
+
+        void main(){
+            // Soft round sprite
+            vec2 d = gl_PointCoord - vec2(0.5);
+            float falloff = 1.0 - smoothstep(0.2, 0.5, length(d));
+            outputColor = vec4(starColor.rgb, starColor.a * falloff);
+        }
+    '''
+}
+
 ######################################################
 
 
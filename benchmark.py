@@ -0,0 +1,258 @@
+#benchmark.py
+# Offscreen render benchmark: runs a scripted, seeded scene through Game.ProcessFrame into an
+# FBO on a display-less GL context (EGL surfaceless or OSMesa, e.g. Mesa llvmpipe) and reports
+# frames per second, per-pass times and frame hashes.
+#
+#   python benchmark.py --scene cruise --frames 300 --out bench.json --png-dir frames/
+#
+# Input logs recorded with `main.py --record` replay headlessly, as fast as the GPU allows:
+#
+#   python benchmark.py --replay session.shrl --out replay.json
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+from utils.offscreen import SelectPlatform, BACKENDS
+from utils.replay import Recorder, InputLog, ApplyToImGui
+
+def BlankInputs():
+    return {
+        "1": False, "W": False, "S": False, "A": False, "D": False, "Q": False, "E": False,
+        "SPACE": False, "L_SHIFT": False, "R_CLICK": False, "L_CLICK": False, "V": False, "F3": False,
+        "mouseDelta": [0.0, 0.0], "cursor_pos": (0.0, 0.0),
+    }
+
+# Scripted scenes: frame index -> inputs. Everything else comes from the world seed.
+def SceneCruise(frame):
+    inputs = BlankInputs()
+    inputs["SPACE"] = True
+    return inputs
+
+def SceneTurn(frame):
+    inputs = BlankInputs()
+    inputs["SPACE"] = True
+    inputs["A"] = (frame // 60) % 2 == 0
+    inputs["W"] = (frame // 90) % 2 == 1
+    return inputs
+
+def SceneFirstPerson(frame):
+    inputs = BlankInputs()
+    inputs["R_CLICK"] = frame == 0  # switch to 1st person on the first frame
+    inputs["L_CLICK"] = frame % 10 == 5
+    inputs["mouseDelta"] = [40.0 if (frame // 45) % 2 == 0 else -40.0, 10.0]
+    inputs["SPACE"] = True
+    return inputs
+
+SCENES = {"cruise": SceneCruise, "turn": SceneTurn, "firstperson": SceneFirstPerson}
+
+def WritePNG(path, image):
+    # Minimal RGBA8 PNG writer, keeps the benchmark free of imaging dependencies
+    height, width, _ = image.shape
+    raw = b"".join(b"\x00" + image[row].tobytes() for row in range(height))
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+def ParseArgs(argv):
+    parser = argparse.ArgumentParser(description="Offscreen Space Heist render benchmark")
+    parser.add_argument("--backend", choices=BACKENDS, default="egl")
+    parser.add_argument("--scene", choices=sorted(SCENES), default="cruise")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10, help="frames rendered before timing starts")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--dt", type=float, default=1.0 / 60.0, help="fixed simulation step")
+    parser.add_argument("--hash-every", type=int, default=1, help="hash every Nth frame, 0 disables")
+    parser.add_argument("--png-dir", default=None, help="also write the hashed frames as PNGs")
+    parser.add_argument("--sync", action="store_true",
+                        help="glFinish after each pass so per-pass times include the GPU work")
+    parser.add_argument("--profile", default=None, help="runtime profile, e.g. production")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="fixed 3D resolution scale, keeps frame hashes reproducible")
+    parser.add_argument("--dynamic-resolution", action="store_true",
+                        help="let the resolution scale adapt to --target-ms instead")
+    parser.add_argument("--target-ms", type=float, default=1000.0 / 60.0)
+    parser.add_argument("--gl-stats", action="store_true",
+                        help="count GL calls per category and frame (slows the CPU side down)")
+    parser.add_argument("--shading", choices=["auto", "full", "vertex", "unlit"], default=None,
+                        help="shading tier for every object (default: the runtime profile's)")
+    parser.add_argument("--no-occlusion", action="store_true", help="draw stations and pirates without occlusion queries")
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--replay", default=None,
+                        help="replay an input log (seed, size, inputs and time steps come from the log)")
+    parser.add_argument("--record", default=None, help="also write the scripted inputs as an input log")
+    args = parser.parse_args(argv)
+    args.log = None
+    if args.replay:
+        args.log = InputLog(args.replay)
+        args.seed = args.log.seed
+        args.width, args.height = args.log.width, args.log.height
+        args.scene = "replay"
+        args.warmup = min(args.warmup, len(args.log))
+        args.frames = len(args.log) - args.warmup
+    return args
+
+def Run(args):
+    SelectPlatform(args.backend)
+    from utils import runtime
+    runtime.Configure(args.profile)
+    from utils.offscreen import OffscreenContext
+    with runtime.trace.Span("context"):
+        context = OffscreenContext(args.backend, args.width, args.height)
+
+    # Only import GL users once the platform is fixed
+    from OpenGL.GL import glClearColor, glClear, glEnable, glDepthFunc, glFinish
+    from OpenGL.GL import GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_DEPTH_TEST, GL_LESS
+    import imgui
+    from imgui.integrations.opengl import ProgrammablePipelineRenderer
+    from utils.graphics import Framebuffer
+    from game import Game
+
+    imgui.create_context()
+    gui = ProgrammablePipelineRenderer()
+    imgui.get_io().display_size = (args.width, args.height)
+
+    target = Framebuffer(args.width, args.height)
+    glEnable(GL_DEPTH_TEST)
+    glDepthFunc(GL_LESS)
+
+    with runtime.trace.Span("game init"):
+        game = Game(args.height, args.width, gui)
+    if args.sync:
+        game.profiler.sync = glFinish
+    game.resolution.adaptive = args.dynamic_resolution
+    game.resolution.target_ms = args.target_ms
+    game.resolution.SetScale(args.scale)
+    game.worldSeed = args.seed
+    if args.gl_stats:
+        game.glStats.Install()
+    if args.shading is not None:
+        game.shading = args.shading
+    if args.no_occlusion:
+        game.occlusion.enabled = False
+    # Scripted scenes start in game, replays where the recorded session started
+    game.screen = 1 if args.log is None else args.log.screen
+    if game.screen == 1:
+        game.InitScene()
+    script = SCENES.get(args.scene)
+
+    recorder = Recorder(args.record, args.seed, args.width, args.height, screen=game.screen) if args.record else None
+    if args.png_dir:
+        os.makedirs(args.png_dir, exist_ok=True)
+
+    hashes = []
+    digest = hashlib.sha256()
+    frame_times = []
+    total = args.warmup + args.frames
+    for frame in range(total):
+        timed = frame >= args.warmup
+        if frame == args.warmup:
+            game.profiler.Clear()
+            game.glStats.frames.clear()
+        start = time.perf_counter()
+        game.profiler.BeginFrame()
+        target.Use()
+        glClearColor(0.0, 0.0, 0.0, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        if args.log is not None:
+            inputs, step = args.log.Frame(frame)
+            ApplyToImGui(inputs)
+        else:
+            inputs, step = script(frame), {"currentTime": frame * args.dt, "deltaTime": args.dt}
+        if recorder is not None:
+            recorder.Record(inputs, step)
+        game.ProcessFrame(inputs, step)
+        game.FinishFrame()
+        glFinish()
+        game.profiler.EndFrame()
+        runtime.trace.Milestone("first frame")
+        if timed:
+            frame_times.append(time.perf_counter() - start)
+
+        # Readback happens outside the timed region
+        if timed and args.hash_every and (frame - args.warmup) % args.hash_every == 0:
+            image = target.ReadPixels()
+            frame_hash = hashlib.sha256(image.tobytes()).hexdigest()
+            hashes.append({"frame": frame - args.warmup, "sha256": frame_hash})
+            digest.update(frame_hash.encode())
+            if args.png_dir:
+                WritePNG(os.path.join(args.png_dir, f"frame_{frame - args.warmup:05d}.png"), image)
+        if game.screen != 1 and args.log is None:
+            # Won or lost: the scene is over, stop here rather than benchmark the menus
+            break
+
+    if recorder is not None:
+        recorder.Close()
+    if game.profiler.gpu is not None:
+        game.profiler.gpu.Collect(wait=True)
+    elapsed = sum(frame_times)
+    report = {
+        "backend": args.backend,
+        "renderer": context.renderer,
+        "gl_version": context.version,
+        "scene": args.scene,
+        "shading": game.shading,
+        "seed": args.seed,
+        "resolution": [args.width, args.height],
+        "frames": len(frame_times),
+        "fps": len(frame_times) / elapsed if elapsed > 0 else 0.0,
+        "frame_ms": game.profiler.Summary().get("frame", {}),
+        "passes": game.profiler.Summary(),
+        "gpu_passes": game.profiler.gpu.Summary() if game.profiler.gpu is not None else {},
+        "values": game.profiler.Values(),
+        "memory": game.MemoryReport(),
+        "gl_calls": {"summary": game.glStats.Summary(), "history": list(game.glStats.frames)} if args.gl_stats else {},
+        "final_screen": game.screen,
+        "startup": runtime.trace.Summary(),
+        "digest": digest.hexdigest(),
+        "hashes": hashes,
+    }
+
+    game.Delete()
+    report["gl_resources_after_delete"] = game.MemoryReport()["gl_resources"]
+    target.Delete()
+    gui.shutdown()
+    context.Delete()
+    return report
+
+def main(argv=None):
+    args = ParseArgs(sys.argv[1:] if argv is None else argv)
+    report = Run(args)
+    print(f"{report['renderer']} {report['resolution'][0]}x{report['resolution'][1]} "
+          f"scene={report['scene']} frames={report['frames']} fps={report['fps']:.1f}")
+    for name, stats in report["passes"].items():
+        gpu = report["gpu_passes"].get(name)
+        print(f"  {name:12s} mean {stats['mean_ms']:8.3f} ms   p95 {stats['p95_ms']:8.3f} ms"
+              + (f"   gpu {gpu['mean_ms']:8.3f} ms" if gpu else ""))
+    if report["gl_calls"]:
+        calls = report["gl_calls"]["summary"]
+        print("  gl calls     " + "  ".join(f"{name} {stats['calls']:.1f}" + (f" ({stats['redundant']:.1f} redundant)" if stats["redundant"] else "")
+                                         for name, stats in calls.items()))
+    shading = {name[len("shading_"):]: stats["mean"] for name, stats in report["values"].items() if name.startswith("shading_")}
+    if shading:
+        print("  shading      " + "  ".join(f"{tier} {count:.1f}" for tier, count in shading.items()) + f"   ({report['shading']})")
+    values = report["values"]
+    if values.get("occlusion_tested", {}).get("mean"):
+        tested, offscreen, hidden = (values[f"occlusion_{name}"]["mean"] for name in ("tested", "offscreen", "hidden"))
+        onscreen = tested - offscreen
+        print(f"  occlusion    {tested:.1f} tested, {offscreen:.1f} off screen, {hidden:.1f} of {onscreen:.1f} on screen occluded"
+              + (f" ({100.0 * hidden / onscreen:.1f}%)" if onscreen > 0 else ""))
+    memory = report["memory"]
+    print(f"  memory       host {memory['host']['total'] / 2**20:8.2f} MiB   gpu {memory['gpu']['total'] / 2**20:8.2f} MiB")
+    print("digest", report["digest"])
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
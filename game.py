@@ -1,12 +1,33 @@
 #game..py
-import imgui
+import imgui  # kept eager, the menu draws with ImGui on the first frame
 import numpy as np
-from utils.graphics import Object, Camera, Shader
-from assets.shaders.shaders import object_shader , lighting_shader
-from assets.objects.objects import  get_planet , get_space_station , get_transporter , rotation_matrix , get_pirate , get_laser
-import random
+from utils.graphics import Object, Camera, Shader, Mesh, ScreenQuad
+from utils.starfield import Starfield
+from utils.minimap import Minimap
+from utils.resolution import DynamicResolution
+from utils.world import SectorGrid, SectorStreamer
+from utils.orbits import Orbits, OrbitPositions
+from utils.collision import BVH, BoundingSphere, ObjectsCollide, SegmentHitsObject, SegmentsNearSpheres, SphereHitsObject
+from utils.profiler import Profiler
+from utils.input import EdgeDetector, Pressed
+from utils.jobs import Job, JobSystem
+from utils.gputimer import GPUTimer
+from utils.glstats import GLStats
+from utils.occlusion import OcclusionCuller
+from utils import meshopt
+from utils.memory import HostBytes, FormatBytes, MemoryTracer
+from utils.resources import manager as resources
+from utils import runtime
+from assets.shaders.shaders import object_shader , lighting_shader , lighting_vertex_shader , unlit_shader , occlusion_shader , star_shader , minimap_shader , quad_shader
 from OpenGL.GL import *
 import copy
+import json
+from time import perf_counter
+
+def Assets():
+    # The OBJ loaders are only needed once a round starts, keep them off the startup path
+    from assets.objects import objects
+    return objects
 
 class Game:
     def __init__(self, height, width, gui):
@@ -14,11 +35,80 @@ class Game:
         self.height = height
         self.width = width
         self.screen = 0
-        self.shaders = [Shader(lighting_shader["vertex_shader"], lighting_shader["fragment_shader"])]
+        # Shading tiers, most expensive first: per-fragment lighting, per-vertex lighting, unlit.
+        # Every program is built here, switching tiers only changes which one an object draws with.
+        self.shadingPrograms = {
+            "full": Shader(lighting_shader["vertex_shader"], lighting_shader["fragment_shader"], "lighting"),
+            "vertex": Shader(lighting_vertex_shader["vertex_shader"], lighting_vertex_shader["fragment_shader"], "lighting vertex"),
+            "unlit": Shader(unlit_shader["vertex_shader"], unlit_shader["fragment_shader"], "unlit"),
+        }
+        self.shaders = list(self.shadingPrograms.values())
+        self.shading = runtime.options.get("shading", "auto")  # a tier for everything, or "auto"
+        self.shadingByGroup = {}  # group -> tier or "auto", overrides self.shading
+        # Automatic tiers: (distance in multiples of the object's scale, tier). Distance over
+        # scale follows the size on screen, so big planets keep full shading further out.
+        self.shadingTiers = ((150.0, "full"), (600.0, "vertex"), (np.inf, "unlit"))
+        self.shadingCounts = dict.fromkeys(self.shadingPrograms, 0)
         self.objects = {}
         self.view_mode = "3rd"
-        self.prev_right_click = False
+        self.inputEdges = EdgeDetector()  # pressed / released for inputs that come without them
         self.objects["lasers"] = []
+        self.worldExtent = 5000.0 # half-size of the world box, can grow well beyond float32 precision
+        self.laserRange = 5000.0
+
+        # Sector streaming: only sectors within streamRadius of the transporter are resident.
+        # Set worldExtent to None for an unbounded galaxy.
+        self.worldSeed = None # None picks a new seed every round
+        self.sectorSize = 2500.0
+        self.streamRadius = 2
+        self.planetsPerSector = 0.3
+        self.piratesPerSector = 0.3
+        self.orbitRadius = 60.0
+        self.minSeparation = 250.0  # between planets, leaves room for the orbiting stations
+        self.orbitSpeed = 0.4  # radians per second
+        self.orbits = Orbits()
+        self.simTime = 0.0  # simulation time of the round, drives the station orbits
+        # Collision is mesh accurate, the transporter docks once it is this close to the station hull
+        self.dockingMargin = 1.0
+        # Balancing: transporter top speed per view mode, pirate chase speed (units per second)
+        self.maxSpeed = {"3rd": 60.0, "1st": 10.0}
+        self.chaseSpeed = 50.0
+        self.colliders = {}  # kind -> BVH, shared by the variants of a kind
+        # Pirate AI level of detail: (distance to the transporter, steering interval in ticks).
+        # Only the first tier can reach the transporter before its next update.
+        self.aiTiers = ((600.0, 1), (2500.0, 4), (np.inf, 15))
+        self.aiTick = 0
+        self.nearPirates = []
+        self.planetPalettes = self.MakePalettes(0)
+        self.meshes = {}
+        self.persistentMeshes = ("station", "transporter", "pirate", "laser")  # never evicted between rounds
+        self.pools = {}
+        self.streamer = None
+        self.objects["transporter"] = None
+        self.ClearScene()
+        self.profiler = Profiler()
+        self.jobs = JobSystem(runtime.options.get("job_workers"), self.profiler)
+        if runtime.options.get("gpu_timers", False):
+            self.profiler.gpu = GPUTimer()
+        # GL call counting, can also be switched on from the debug panel
+        self.glStats = GLStats()
+        if runtime.options.get("gl_stats", False):
+            self.glStats.Install()
+        self.starfield = Starfield(Shader(star_shader["vertex_shader"], star_shader["fragment_shader"], "stars"))
+        self.screenQuad = ScreenQuad(Shader(quad_shader["vertex_shader"], quad_shader["fragment_shader"], "quad"))
+        self.minimap = Minimap(Shader(minimap_shader["vertex_shader"], minimap_shader["fragment_shader"], "minimap"), self.screenQuad)
+        # Stations and pirates hidden behind the planets are skipped, see utils/occlusion.py
+        self.occlusion = OcclusionCuller(Shader(occlusion_shader["vertex_shader"], occlusion_shader["fragment_shader"], "occlusion"))
+        self.occlusion.enabled = runtime.options.get("occlusion_culling", True)
+        self.currentTime = 0.0
+        # The 3D scene is rendered at a scale that follows the frame time budget
+        self.resolution = DynamicResolution(width, height)
+        self.lastFrameStart = None
+        # Memory accounting, F3 shows the debug panel
+        self.memoryTracer = MemoryTracer(runtime.options.get("memory_trace", False))
+        self.showDebug = False
+        self.memoryReport = None
+        self.memoryReportTime = None
 
     def DrawCrosshair(self):
         # Only draw the crosshair in 1st person view
@@ -44,21 +134,273 @@ class Game:
                             center_x, center_y + crosshair_length,
                             color, thickness)
 
+    def GetMesh(self, kind, variant=None):
+        # Meshes are loaded once per game and shared by every entity of that kind.
+        # Returns the mesh and the per-entity property template of the factory.
+        key = (kind, variant)
+        if key not in self.meshes:
+            with runtime.trace.Span("asset load"):
+                assets = Assets()
+                if kind == "planet":
+                    # Black to white: the vertex colors hold the gradient factor, palettes are uniforms
+                    template = assets.get_planet(np.zeros(3), np.ones(3))
+                elif kind == "station":
+                    template = assets.get_space_station(is_destination_space_station=variant)
+                elif kind == "transporter":
+                    template = assets.get_transporter()
+                elif kind == "pirate":
+                    template = assets.get_pirate()
+                else:
+                    template = assets.get_laser()
+                if kind in ("station", "transporter", "pirate"):
+                    if kind not in self.colliders:
+                        with runtime.trace.Span("bvh build"):
+                            self.colliders[kind] = BVH(template["positions"])
+                    bvh = self.colliders[kind]
+                else:
+                    bvh = None
+                # Indexed and ordered for the vertex cache (cached on disk after the first run)
+                with runtime.trace.Span("mesh optimize"):
+                    optimized = meshopt.Optimize(kind, template["positions"], template["normals"], template["colors"])
+                stats = optimized.pop("stats")
+                template.update(optimized)
+                runtime.Log(f"Mesh {kind}: {stats['soup_vertices']} -> {stats['vertices']} vertices, "
+                            f"ACMR {stats['acmr_before']:.3f} -> {stats['acmr_after']:.3f}")
+                mesh = Mesh(template)  # strips the geometry out of the template
+                mesh.bvh = bvh
+                mesh.stats = stats
+            self.meshes[key] = (mesh, template)
+        return self.meshes[key]
+
+    def AcquireObject(self, group, kind, variant=None, **state):
+        # Take an Object from the pool of its group (or make one) and give it fresh state
+        mesh, template = self.GetMesh(kind, variant)
+        properties = dict(template)
+        properties.update(state)
+        pool = self.pools.setdefault(group, [])
+        if pool:
+            obj = pool.pop()
+            obj.Reset(mesh, properties)
+        else:
+            properties["mesh"] = mesh
+            obj = Object(None, self.shaders[0], properties)
+        obj.RetainMesh()  # live objects keep their mesh's GL buffers alive
+        return obj
+
+    def ReleaseObject(self, group, obj):
+        if obj in self.objects.get(group, []):
+            self.objects[group].remove(obj)
+        pool = self.pools.setdefault(group, [])
+        if any(pooled is obj for pooled in pool):
+            runtime.Log(f"ReleaseObject: {group} object released twice, ignored")
+            return
+        obj.ReleaseMesh()
+        self.occlusion.Forget(obj)
+        pool.append(obj)
+
+    def TrimMeshes(self):
+        # Meshes only the cache still references (e.g. planet palettes of the previous round)
+        # are released, their buffers go away in the next resource flush
+        for key, (mesh, template) in list(self.meshes.items()):
+            if key[0] not in self.persistentMeshes and mesh.References() <= 1:
+                mesh.Release()
+                del self.meshes[key]
+
+    def FinishFrame(self):
+        # Frame end: deletes the GL objects released during the frame in one batch
+        released = resources.Flush()
+        self.profiler.Set("gl_released", released)
+        self.profiler.Set("gl_objects", len(resources.refs))
+        if self.glStats.enabled:
+            frame = self.glStats.EndFrame()
+            self.profiler.Set("gl_calls", frame["total"])
+            self.profiler.Set("gl_draws", frame["calls"].get("draw", 0))
+            self.profiler.Set("gl_redundant", sum(frame["redundant"].values()))
+
+    def Delete(self):
+        # Releases every GL object the game owns
+        self.ClearScene()
+        for mesh, template in self.meshes.values():
+            mesh.Release()
+        self.meshes = {}
+        self.starfield.Delete()
+        self.minimap.Delete()
+        self.resolution.Delete()
+        self.screenQuad.Delete()
+        self.occlusion.Delete()
+        for shader in self.shaders + [self.starfield.shader, self.minimap.shader, self.screenQuad.shader, self.occlusion.shader]:
+            resources.Release(shader)
+        if self.profiler.gpu is not None:
+            self.profiler.gpu.Delete()
+            self.profiler.gpu = None
+        resources.Flush()
+        self.jobs.Shutdown()
+        self.glStats.Uninstall()
+
+    def StationPosition(self, center, angle):
+        return OrbitPositions(center, [self.orbitRadius], angle)[0]
+
+    def MakePalettes(self, seed, count=16):
+        # (bottom, top) gradient colors for the planets of a round
+        colors = np.random.default_rng([seed, 2]).random((count, 2, 3))
+        return [(pair[0], pair[1]) for pair in colors]
+
+    def MakePlanet(self, position, palette):
+        scale_val = 50.0
+        return self.AcquireObject("planets", "planet",
+                                  palette=self.planetPalettes[int(palette)],
+                                  position=np.array(position, dtype=np.float64),
+                                  scale=np.array([scale_val, scale_val, scale_val], dtype=np.float32))
+
+    def MakeStation(self, center, angle, is_destination):
+        # `angle` is the orbit phase at the start of the round, the station is placed for the current time
+        center = np.array(center, dtype=np.float64)
+        current = angle + self.orbitSpeed * self.simTime
+        return self.AcquireObject("stations", "station", bool(is_destination),
+                                  orbitCenter=center.copy(),
+                                  orbitRadius=self.orbitRadius,
+                                  orbitPhase=float(angle),
+                                  orbitSpeed=self.orbitSpeed,
+                                  position=self.StationPosition(center, current),
+                                  rotation=np.array([0, 0, current], dtype=np.float64),
+                                  scale=np.array([5, 5, 5], dtype=np.float32))
+
+    def MakePirate(self, position, direction, home=None):
+        speed = 50
+        return self.AcquireObject("pirates", "pirate",
+                                  position=np.array(position, dtype=np.float64),
+                                  scale=np.array([1, 1, 1], dtype=np.float32),
+                                  velocity=np.asarray(direction) * speed,
+                                  home=home, aiNext=0, aiElapsed=0.0)
+
+    def SpawnSector(self, key, sector):
+        # Called by the streamer when a sector comes into range
+        spawned = {"planets": [], "stations": [], "pirates": []}
+        removed = self.sectorState.get(key, set())
+        for i, center in enumerate(sector["planet_positions"]):
+            if (key, i) in self.pinned:
+                continue
+            spawned["planets"].append(self.MakePlanet(center, sector["planet_palettes"][i]))
+            spawned["stations"].append(self.MakeStation(center, sector["orbit_angles"][i], False))
+        for i, position in enumerate(sector["pirate_positions"]):
+            if i in removed:
+                continue
+            spawned["pirates"].append(self.MakePirate(position, sector["pirate_velocities"][i], home=(key, i)))
+        for group, objs in spawned.items():
+            self.objects[group].extend(objs)
+        self.sectorObjects[key] = spawned
+        self.orbits.Invalidate()
+
+    def ReleaseSector(self, key):
+        # Called by the streamer when a sector goes out of range
+        spawned = self.sectorObjects.pop(key, None)
+        if spawned is None:
+            return
+        for group in ("planets", "stations"):
+            for obj in spawned[group]:
+                self.ReleaseObject(group, obj)
+        self.orbits.Invalidate()
+        for pirate in spawned["pirates"]:
+            home = pirate.properties.get("home")
+            if home is None or home[0] != key or pirate not in self.objects["pirates"]:
+                continue  # destroyed, or the pooled Object now belongs to another entity
+            if self.InStreamRange(pirate.properties["position"]):
+                # Still chasing nearby: it leaves its sector for good and roams until out of range
+                self.ForgetPirate(pirate)
+                if pirate not in self.roamingPirates:
+                    self.roamingPirates.append(pirate)
+            else:
+                self.ReleaseObject("pirates", pirate)
+
+    def InStreamRange(self, position):
+        transporter = self.objects.get("transporter")
+        if transporter is None:
+            return False
+        reach = self.streamRadius * self.sectorSize
+        return np.linalg.norm(position - transporter.properties["position"]) < reach
+
+    def ForgetPirate(self, pirate):
+        # Make sure a pirate that left or died is not respawned by its home sector
+        home = pirate.properties.get("home")
+        if home is not None:
+            key, index = home
+            self.sectorState.setdefault(key, set()).add(index)
+            pirate.properties["home"] = None
+            # The Object goes back to the pool, its old sector must not release it again
+            spawned = self.sectorObjects.get(key)
+            if spawned is not None and pirate in spawned["pirates"]:
+                spawned["pirates"].remove(pirate)
+
+    def DestroyPirate(self, pirate):
+        self.ForgetPirate(pirate)
+        if pirate in self.roamingPirates:
+            self.roamingPirates.remove(pirate)
+        self.ReleaseObject("pirates", pirate)
+
+    def UpdateStreaming(self):
+        transporter = self.objects.get("transporter")
+        if self.streamer is None or transporter is None:
+            return
+        previous = self.streamer.center
+        self.streamer.Update(transporter.properties["position"])
+        if self.streamer.center != previous:
+            for pirate in self.roamingPirates[:]:
+                if not self.InStreamRange(pirate.properties["position"]):
+                    self.roamingPirates.remove(pirate)
+                    self.ReleaseObject("pirates", pirate)
+
+    def ClearScene(self):
+        # Return every entity of the previous round to the pools
+        if self.streamer is not None:
+            self.streamer.Clear()
+            self.streamer = None
+        for group in ("planets", "stations", "pirates", "lasers"):
+            for obj in self.objects.get(group, [])[:]:
+                self.ReleaseObject(group, obj)
+            self.objects[group] = []
+        if self.objects.get("transporter") is not None:
+            self.objects["transporter"].ReleaseMesh()
+            self.pools.setdefault("transporter", []).append(self.objects["transporter"])
+        self.objects["transporter"] = None
+        self.sectorObjects = {}
+        self.sectorState = {}
+        self.roamingPirates = []
+        self.pinned = set()
+        self.nearPirates = []
+        self.collisionAnchor = None  # transporter position at the last collision check
+        self.orbits.Invalidate()
+        self.simTime = 0.0
+
+    def RandomSector(self, rng, around):
+        if self.grid.bounds is not None:
+            low, high = self.grid.bounds
+            return tuple(int(k) for k in rng.integers(low, np.asarray(high) + 1))
+        return tuple(int(k) for k in np.asarray(around) + rng.integers(-4, 5, size=3))
+
     def spawn_laser(self):
-        laser = get_laser()
-        laser["position"] = copy.deepcopy(self.camera.position)
         laser_speed = 500.0  
-        laser["velocity"] = self.camera.lookAt * laser_speed
-        laser["scale"] = np.array([0.05, 0.05, 0.05], dtype=np.float32)
-        
-        self.objects["lasers"].append(Object(None, self.shaders[0], laser))
+        laser = self.AcquireObject("lasers", "laser",
+                                   position=copy.deepcopy(self.camera.position),
+                                   previous=copy.deepcopy(self.camera.position),
+                                   velocity=self.camera.lookAt * laser_speed,
+                                   scale=np.array([0.05, 0.05, 0.05], dtype=np.float32))
+        self.objects["lasers"].append(laser)
 
     def InitScene(self):
+        # Host allocations of the scene setup are traced, see MemoryReport.
+        # Meshes, GPU buffers and pooled objects survive between rounds, a restart only
+        # regenerates positions and palettes from the new seed.
+        start = perf_counter()
+        with self.memoryTracer.Trace("InitScene"):
+            self.BuildScene()
+        runtime.Log(f"Round ready in {1000.0 * (perf_counter() - start):.1f} ms")
+
+    def BuildScene(self):
         if self.screen == 1:
             self.view_mode = "3rd"
             def setCamera():
                 self.camera = Camera(self.height, self.width)
-                self.camera.position = np.array([0, 0, 0], dtype=np.float32)
+                self.camera.position = np.array([0, 0, 0], dtype=np.float64)
                 self.camera.lookAt = np.array([0, 0, -1], dtype=np.float32)
                 self.camera.up = np.array([0, 1, 0], dtype=np.float32)
                 self.camera.fov = 90
@@ -68,125 +410,86 @@ class Game:
             setCamera()
 
             def setWorldLimits():
-                self.worldMin = np.array([-5000, -5000, -5000], dtype=np.float32)
-                self.worldMax = np.array([5000, 5000, 5000], dtype=np.float32)
+                # World positions are float64, rendering is rebased on the camera each frame
+                extent = self.worldExtent if self.worldExtent is not None else np.inf
+                self.worldMin = np.array([-extent] * 3, dtype=np.float64)
+                self.worldMax = np.array([extent] * 3, dtype=np.float64)
             setWorldLimits()
 
-            self.n_planets = 20 # for example
-
-            self.objects["planets"] = []
-            for i in range(self.n_planets):
-                bottom_color = np.array([random.random(), random.random(), random.random()])
-                top_color = np.array([random.random(), random.random(), random.random()])
-
-                planet = get_planet(bottom_color , top_color)  
-                
-                if "normals" not in planet:
-                    n_vertices = len(planet["vertices"]) // 3
-                    default_normals = np.tile(np.array([0, 0, 1], dtype=np.float32), n_vertices)
-                    planet["normals"] = default_normals
-
-                pos = np.array([
-                    np.random.uniform(-5000, 5000),
-                    np.random.uniform(-5000, 5000),
-                    np.random.uniform(-5000, 5000)
-                ], dtype=np.float32)
-
-                planet["position"] = pos
-                scale_val = 50.0
-                planet["scale"] = np.array([scale_val, scale_val, scale_val], dtype=np.float32)
-                self.objects["planets"].append(Object(None, self.shaders[0], planet))
-            
-            self.objects["stations"] = []
-            num_stations = len(self.objects.get("planets", []))
-
-            if num_stations >= 2:
-                indices = list(range(num_stations))
-                source_index = random.choice(indices)
-                indices.remove(source_index)
-                destination_index = random.choice(indices)
-            else:
-                source_index = 0
-                destination_index = 0
-
-            for i, planet_obj in enumerate(self.objects.get("planets", [])):
-                is_destination = (i == destination_index)
-                station = get_space_station(is_destination_space_station=is_destination)
-
-                if "normals" not in station:
-                    n_vertices = len(station["vertices"]) // 3
-                    station["normals"] = np.tile(np.array([0, 0, 1], dtype=np.float32), n_vertices)
-                
-                orbit_radius = 60.0  # Adjust as needed
-                orbit_angle = random.uniform(0, 2 * np.pi)
-    
-                offset = np.array([
-                    orbit_radius * np.cos(orbit_angle) ,
-                    0,
-                    orbit_radius * np.sin(orbit_angle) 
-                ], dtype=np.float32)
-
-                orbit_center = planet_obj.properties["position"].copy()
-                
-                station["orbitCenter"] = planet_obj.properties["position"].copy()
-
-                station["position"] = orbit_center + offset
-                station["rotation_radius"] = orbit_radius
-                station["init_position"] = orbit_center.copy()
-                station["rotation"] =  np.array([0, 0, orbit_angle], dtype=np.float32)
-                station["scale"] = np.array([5, 5, 5], dtype=np.float32)
-                self.objects["stations"].append(Object(None, self.shaders[0], station))
-
-            print(f"Source index: {source_index}, Destination index: {destination_index}")
-
-            source_station = self.objects["stations"][source_index]
-            destination_station = self.objects["stations"][destination_index]
-            self.destination_station = destination_station
-
-            self.destination_planet = self.objects["planets"][destination_index]
-            print("Destination planet position:", self.destination_planet.properties["position"])
-
-            transporter = get_transporter()
-            transporter["position"] = copy.deepcopy(source_station.properties["position"])+ np.array([0, -1.0, 0], dtype=np.float32)
-            print("Source station position: ", source_station.properties["position"])
-            print("Transporter position: ", transporter["position"])
-            print("Destination station position: ", destination_station.properties["position"])
-            transporter["scale"] = np.array([0.2, 0.2, 0.2], dtype=np.float32)
-            self.objects["transporter"] = Object(None, self.shaders[0], transporter)
-            
-            self.n_pirates = 20 
-            self.objects["pirates"] = []
-            for i in range(self.n_pirates):
-                pirate = get_pirate()
-                
-                pos = np.array([
-                    np.random.uniform(-4000, 4000),
-                    np.random.uniform(-4000, 4000),
-                    np.random.uniform(-4000, 4000)
-                ], dtype=np.float32)
-
-                pirate["position"] = pos
-                pirate["scale"] = np.array([1, 1, 1], dtype=np.float32)
-
-                speed = 50
-                direction = np.random.uniform(-1, 1, size=3)
-                direction_norm = np.linalg.norm(direction)
-                if direction_norm > 0:
-                    direction = direction / direction_norm  
-                pirate["velocity"] = direction * speed
-                pirate_obj = Object(None, self.shaders[0], pirate)
-                self.objects["pirates"].append(pirate_obj)
+            self.ClearScene()
+
+            # The galaxy is generated sector by sector from the seed, only sectors around
+            # the transporter are resident.
+            seed = self.worldSeed if self.worldSeed is not None else int(np.random.default_rng().integers(2**31))
+            runtime.Log("World seed:", seed)
+            self.planetPalettes = self.MakePalettes(seed, len(self.planetPalettes))
+            bounds = None
+            if self.worldExtent is not None:
+                n = int(np.ceil(self.worldExtent / self.sectorSize))
+                bounds = ((-n, -n, -n), (n - 1, n - 1, n - 1))
+            self.grid = SectorGrid(seed, self.sectorSize, self.planetsPerSector, self.piratesPerSector,
+                                   len(self.planetPalettes), bounds, self.minSeparation)
+            rng = np.random.default_rng([seed, 1])
+
+            source = self.grid.FindPlanet(self.RandomSector(rng, (0, 0, 0)))
+            destination = self.grid.FindPlanet(self.RandomSector(rng, source[0]), exclude={source})
+            if destination is None:
+                destination = source
+            runtime.Log(f"Source: {source}, Destination: {destination}")
+
+            # The destination is pinned: always resident, whatever the transporter position
+            self.pinned = {destination}
+            dest_sector = self.grid.Generate(destination[0])
+            dest_center = dest_sector["planet_positions"][destination[1]]
+            self.destination_planet = self.MakePlanet(dest_center, dest_sector["planet_palettes"][destination[1]])
+            self.destination_station = self.MakeStation(dest_center, dest_sector["orbit_angles"][destination[1]], True)
+            self.objects["planets"].append(self.destination_planet)
+            self.objects["stations"].append(self.destination_station)
+            runtime.Log("Destination planet position:", self.destination_planet.properties["position"])
+
+            source_sector = self.grid.Generate(source[0])
+            source_position = self.StationPosition(source_sector["planet_positions"][source[1]],
+                                                   source_sector["orbit_angles"][source[1]])
+
+            transporter = self.AcquireObject("transporter", "transporter",
+                                             position=source_position + np.array([0, -1.0, 0], dtype=np.float64),
+                                             scale=np.array([0.2, 0.2, 0.2], dtype=np.float32))
+            runtime.Log("Source station position: ", source_position)
+            runtime.Log("Transporter position: ", transporter.properties["position"])
+            runtime.Log("Destination station position: ", self.destination_station.properties["position"])
+            self.objects["transporter"] = transporter
+
+            self.streamer = SectorStreamer(self.grid, self.streamRadius, self.SpawnSector, self.ReleaseSector)
+            self.UpdateStreaming()
+            self.TrimMeshes()
+            self.minimap.Invalidate()
+
+    def IsIdle(self):
+        # Everything but gameplay is a static screen that only changes on input
+        return self.screen != 1
 
     def ProcessFrame(self, inputs, time):
-        current_right_click = inputs.get("R_CLICK", False)
-        if current_right_click and not self.prev_right_click:
+        self.currentTime = time["currentTime"]
+        frame_start = perf_counter()
+        if self.lastFrameStart is not None:
+            self.resolution.Update(1000.0 * (frame_start - self.lastFrameStart))
+        self.lastFrameStart = frame_start
+        self.profiler.Set("resolution_scale", self.resolution.scale)
+        self.inputEdges.Update(inputs)
+        if "events" in inputs:
+            self.profiler.Set("input_events", inputs["events"])
+            self.profiler.Set("input_latency_ms", 1000.0 * inputs["latency"])
+        if Pressed(inputs, "R_CLICK"):
             # Toggle view mode.
             self.view_mode = "1st" if self.view_mode == "3rd" else "3rd"
-            print("Switched to", self.view_mode, "person view")
-        self.prev_right_click = current_right_click
-
-        self.DrawText()
-        self.UpdateScene(inputs, time)
+            runtime.Log("Switched to", self.view_mode, "person view")
+        if Pressed(inputs, "F3"):
+            self.showDebug = not self.showDebug
+
+        with self.profiler.Section("menu"):
+            self.DrawText()
+        with self.profiler.Section("update"):
+            self.UpdateScene(inputs, time)
         self.DrawScene()
 
     def DrawText(self):
@@ -211,7 +514,7 @@ class Game:
             self.gui.render(imgui.get_draw_data())
 
         if self.screen == 2: 
-            window_w, window_h = 400, 200  
+            window_w, window_h = 400, 220  
             x_pos = (self.width - window_w) / 2
             y_pos = (self.height - window_h) / 2
 
@@ -223,6 +526,9 @@ class Game:
             imgui.set_cursor_pos_x((window_w - imgui.calc_text_size("GAME WON")[0]) / 2)
             imgui.text("GAME WON")
             
+            if imgui.button("Play Again", 395, 80):
+                self.screen = 1
+                self.InitScene()
             if imgui.button("Back to Menu", 395, 80):
                 self.screen = 0  
             
@@ -232,7 +538,7 @@ class Game:
 
 
         if self.screen == 3: 
-            window_w, window_h = 400, 200 
+            window_w, window_h = 400, 220 
             x_pos = (self.width - window_w) / 2
             y_pos = (self.height - window_h) / 2
 
@@ -244,6 +550,9 @@ class Game:
             imgui.set_cursor_pos_x((window_w - imgui.calc_text_size("GAME OVER")[0]) / 2)
             imgui.text("GAME OVER")
             
+            if imgui.button("Play Again", 395, 80):
+                self.screen = 1
+                self.InitScene()
             if imgui.button("Back to Menu", 395, 80):
                 self.screen = 0   
             
@@ -254,40 +563,52 @@ class Game:
     def UpdateScene(self, inputs, time):
         if self.screen == 1: 
             delta = time["deltaTime"]
-            theta = 0.4 * delta  # Increment per frame.
-
-            for station_obj in self.objects.get("stations", []):
-                station_obj.properties["rotation"][2] += theta
-                radius = station_obj.properties["rotation_radius"]
-                center = station_obj.properties["init_position"]
-                station_obj.properties["position"][0] = center[0] + radius * np.cos(station_obj.properties["rotation"][2])
-                station_obj.properties["position"][1] = center[1] + radius * np.sin(station_obj.properties["rotation"][2])
-                station_obj.properties["position"][2] = center[2]
-            
+            rotation_matrix = Assets().rotation_matrix
+            self.UpdateStreaming()
+            self.simTime += delta
+
+            # Stations follow closed-form orbits. Only those in view (with some slack for
+            # turning) or on the radar are placed, the rest keep their last position.
+            def orbits():
+                aspect = self.width / self.height
+                half_angle = np.arctan(np.tan(np.radians(self.camera.fov) / 2.0) * np.hypot(1.0, aspect)) + 0.1
+                placed = self.orbits.Update(self.objects.get("stations", []), self.simTime, self.camera.position,
+                                            self.camera.lookAt, half_angle, self.minimap.map_range)
+                # The destination is always needed: docking check, HUD arrow and radar
+                Orbits.Place(self.destination_station, self.simTime)
+                return placed
+
             # Update pirates so that they chase the transporter
-            if self.objects.get("pirates") is not None and self.objects.get("transporter") is not None:
-                transporter_pos = self.objects["transporter"].properties["position"]
-                chase_speed = 50.0  
-                for pirate_obj in self.objects.get("pirates", []):
-                    pirate_pos = pirate_obj.properties["position"]
-                    direction = transporter_pos - pirate_pos
-                    norm = np.linalg.norm(direction)
-                    if norm > 0:
-                        direction = direction / norm  # Normalize
-                    else:
-                        direction = np.array([0, 0, 0], dtype=np.float32)
-                    pirate_obj.properties["velocity"] = direction * chase_speed
-                    pirate_obj.properties["position"] += pirate_obj.properties["velocity"] * delta
+            def pirates():
+                if self.objects.get("pirates") is not None and self.objects.get("transporter") is not None:
+                    return self.UpdatePirates(delta)
+
+            # Orbits and pirate steering share no state and run as concurrent jobs, both are
+            # done before the collision checks below
+            results = self.jobs.Run([
+                Job("orbits", orbits, reads=("camera", "simTime"), writes=("stations",)),
+                Job("ai", pirates, reads=("transporter",), writes=("pirates",)),
+            ])
+            # Recorded here, the profiler is not thread safe
+            self.profiler.Set("stations_placed", results["orbits"])
+            for name, value in (results["ai"] or {}).items():
+                self.profiler.Set(name, value)
 
             if self.objects.get("transporter") is not None and self.objects.get("pirates") is not None:
-                transporter_pos = self.objects["transporter"].properties["position"]
-                collision_threshold = 3.0  
-                for pirate_obj in self.objects["pirates"]:
-                    pirate_pos = pirate_obj.properties["position"]
-                    if np.linalg.norm(transporter_pos - pirate_pos) < collision_threshold:
-                        print("Collision detected! Game Over.")
-                        self.screen = 3 
-                        break
+                with self.profiler.Section("collision"):
+                    # Pirates outside the near tier cannot touch the transporter this tick.
+                    # The test sweeps the step each pirate moved relative to the transporter.
+                    transporter = self.objects["transporter"]
+                    position = np.array(transporter.properties["position"], dtype=np.float64)
+                    moved = position - self.collisionAnchor if self.collisionAnchor is not None else np.zeros(3)
+                    self.collisionAnchor = position
+                    for pirate_obj in self.nearPirates:
+                        properties = pirate_obj.properties
+                        displacement = properties["position"] - properties.get("previous", properties["position"]) - moved
+                        if ObjectsCollide(transporter, pirate_obj, displacement):
+                            runtime.Log("Collision detected! Game Over.")
+                            self.screen = 3
+                            break
             
             if self.view_mode == "3rd":
                 if self.objects.get("transporter") is not None:
@@ -310,7 +631,7 @@ class Game:
                     new_orient = current_orient @ dR
                     transporter.properties["orientation"] = new_orient
 
-                    max_speed = 60.0 
+                    max_speed = self.maxSpeed["3rd"]
 
                     forward_spaceship = new_orient @ np.array([0, 0, -1], dtype=np.float32)
                     up_spaceship = new_orient @ np.array([0, 1, 0], dtype=np.float32)
@@ -331,17 +652,18 @@ class Game:
                     self.camera.up = up_spaceship
                     self.camera.position = copy.deepcopy(transporter.properties["position"]) - (5*forward_spaceship) + (up_spaceship)
 
-                    dest_pos = self.destination_station.properties["position"]
-                    transport_pos = transporter.properties["position"]
-                    distance_to_destination = np.linalg.norm(dest_pos - transport_pos)
-                    if distance_to_destination < 10.0:
-                        print("Game Won! Distance:", distance_to_destination)
+                    # Docked: the transporter's bounding sphere reaches the station hull
+                    center, radius = BoundingSphere(transporter)
+                    with self.profiler.Section("collision"):
+                        docked = SphereHitsObject(center, radius + self.dockingMargin, self.destination_station)
+                    if docked:
+                        runtime.Log("Game Won! Docked at", self.destination_station.properties["position"])
                         self.screen = 2  # Switch to game-won screen
 
             else:               
                 if inputs.get("L_CLICK"):
                     self.spawn_laser()
-                    print("Laser fired!")
+                    runtime.Log("Laser fired!")
                 
                 mousedelta = np.linalg.norm(inputs["mouseDelta"])/1000 * time['deltaTime']
                 cam_left = np.cross(self.camera.up, self.camera.lookAt)
@@ -369,7 +691,7 @@ class Game:
                     forward_spaceship = current_orient @ np.array([0, 0, -1], dtype=np.float32)
                     up_spaceship = current_orient @ np.array([0, 1, 0], dtype=np.float32)
 
-                    max_speed = 10.0
+                    max_speed = self.maxSpeed["1st"]
                     # Allow only space bar to accelerate the spaceship in the forward direction.
                     if inputs.get("SPACE"):
                         transporter.properties["speed"] += 0.05
@@ -393,19 +715,30 @@ class Game:
                 # --- Update lasers ---
                 if "lasers" in self.objects:
                     for laser_obj in self.objects["lasers"][:]:
+                        laser_obj.properties["previous"] = laser_obj.properties["position"].copy()
                         laser_obj.properties["position"] += laser_obj.properties["velocity"] * delta
                         
-                        if np.linalg.norm(laser_obj.properties["position"]) > 5000:
-                            self.objects["lasers"].remove(laser_obj)       
+                        # Lasers expire by range from the camera, not from the world origin
+                        if np.linalg.norm(laser_obj.properties["position"] - self.camera.position) > self.laserRange:
+                            self.ReleaseObject("lasers", laser_obj)       
             
             ############################################################################
             # Update Pirates (Write logic to update their velocity based on transporter position, and check for collision with laser or transporter)
-            for pirate in self.objects['pirates']:
-                for laser in self.objects['lasers']:
-                    if np.linalg.norm(pirate.properties['position'] - laser.properties['position']) < 50:
-                        self.objects['pirates'].remove(pirate)
-                        self.objects['lasers'].remove(laser)
-                        break
+            # Lasers are swept over the last step so fast bolts cannot skip through a hull
+            with self.profiler.Section("collision"):
+                pirates, lasers = self.objects['pirates'][:], self.objects['lasers'][:]
+                if pirates and lasers:
+                    spheres = [BoundingSphere(pirate) for pirate in pirates]
+                    near = SegmentsNearSpheres([laser.properties['previous'] for laser in lasers],
+                                               [laser.properties['position'] for laser in lasers],
+                                               [center for center, _ in spheres], [radius for _, radius in spheres])
+                    for laser_index, pirate_index in zip(*np.nonzero(near)):
+                        pirate, laser = pirates[pirate_index], lasers[laser_index]
+                        if pirate not in self.objects['pirates'] or laser not in self.objects['lasers']:
+                            continue  # already used up this frame
+                        if SegmentHitsObject(laser.properties['previous'], laser.properties['position'], pirate):
+                            self.DestroyPirate(pirate)
+                            self.ReleaseObject('lasers', laser)
 
             ############################################################################
             # Update Camera (Check for view (3rd person or 1st person) and set position and LookAt accordingly)
@@ -424,98 +757,324 @@ class Game:
         elif self.screen == 3: # GAME OVER
             pass
     
+    def UpdatePirates(self, delta):
+        # Pirates are only steered when due: every tick in the near tier, every few ticks further
+        # out. The time since the last update is integrated in one step along the new heading.
+        transporter_pos = self.objects["transporter"].properties["position"]
+        chase_speed = self.chaseSpeed
+        self.aiTick += 1
+        self.nearPirates = []
+        updated = 0
+        for index, pirate_obj in enumerate(self.objects.get("pirates", [])):
+            properties = pirate_obj.properties
+            properties["aiElapsed"] += delta
+            if properties["aiNext"] > self.aiTick:
+                continue
+            direction = transporter_pos - properties["position"]
+            norm = np.linalg.norm(direction)
+            if norm > 0:
+                direction = direction / norm  # Normalize
+            else:
+                direction = np.array([0, 0, 0], dtype=np.float32)
+            properties["velocity"] = direction * chase_speed
+            properties["previous"] = properties["position"].copy()  # start of the step, for the swept collision test
+            properties["position"] += properties["velocity"] * properties["aiElapsed"]
+            properties["aiElapsed"] = 0.0
+            updated += 1
+
+            # Re-tier on every update, a pirate closing in is promoted at its next update at the latest
+            tier = next(i for i, (limit, _) in enumerate(self.aiTiers) if norm < limit)
+            interval = self.aiTiers[tier][1]
+            if properties["aiNext"] == 0:
+                # First update: spread the slow tiers over their interval to avoid spikes
+                interval = 1 + index % interval
+            properties["aiNext"] = self.aiTick + interval
+            if tier == 0:
+                self.nearPirates.append(pirate_obj)
+        # Runs on a job thread: the counts go back to the caller instead of the profiler
+        return {"pirates": len(self.objects.get("pirates", [])), "pirates_updated": updated,
+                "pirates_near": len(self.nearPirates)}
+
+    def MemoryReport(self):
+        # Bytes per mesh, per entity group and in total, host arrays and GL buffers
+        meshes = {}
+        for (kind, variant), (mesh, template) in self.meshes.items():
+            name = kind if variant is None else f"{kind}/{variant}"
+            meshes[name] = {"vertices": mesh.num_vertices, "gpu_bytes": mesh.GPUBytes(), "host_bytes": HostBytes(template),
+                            "acmr": [mesh.stats["acmr_before"], mesh.stats["acmr_after"]]}
+        colliders = {kind: bvh.nbytes for kind, bvh in self.colliders.items()}
+
+        entities = {}
+        for group in ("planets", "stations", "pirates", "lasers", "transporter"):
+            active = self.objects.get(group)
+            active = [active] if isinstance(active, Object) else list(active or [])
+            pooled = self.pools.get(group, [])
+            # Meshes are shared, each one is charged once to every group that uses it
+            used = {id(obj.mesh): obj.mesh for obj in active + pooled}
+            entities[group] = {
+                "active": len(active),
+                "pooled": len(pooled),
+                "host_bytes": HostBytes([obj.properties for obj in active + pooled]),
+                "gpu_bytes": sum(mesh.GPUBytes() for mesh in used.values()),
+            }
+
+        gpu = {
+            "meshes": sum(mesh["gpu_bytes"] for mesh in meshes.values()),
+            "starfield": self.starfield.vbo.nbytes,
+            "minimap": self.minimap.target.nbytes + self.minimap.vbo.nbytes,
+            "resolution": self.resolution.target.nbytes,
+        }
+        gpu["total"] = sum(gpu.values())
+        host = {
+            "meshes": sum(mesh["host_bytes"] for mesh in meshes.values()),
+            "colliders": sum(colliders.values()),
+            "entities": sum(entity["host_bytes"] for entity in entities.values()),
+        }
+        host["total"] = sum(host.values())
+        return {"meshes": meshes, "colliders": colliders, "entities": entities,
+                "gpu": gpu, "host": host, "traces": dict(self.memoryTracer.traces),
+                "gl_resources": resources.Counts()}
+
+    def DumpMemory(self, path):
+        report = self.MemoryReport()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def DrawDebugPanel(self):
+        # The report walks every entity, refresh it once a second only
+        if self.memoryReportTime is None or self.currentTime - self.memoryReportTime >= 1.0:
+            self.memoryReport = self.MemoryReport()
+            self.memoryReportTime = self.currentTime
+        report = self.memoryReport
+
+        imgui.set_next_window_position(self.width - 360, 220, imgui.FIRST_USE_EVER)
+        imgui.set_next_window_size(340, 360, imgui.FIRST_USE_EVER)
+        imgui.begin("Debug")
+        if imgui.collapsing_header("Memory", flags=imgui.TREE_NODE_DEFAULT_OPEN)[0]:
+            imgui.text(f"Host {FormatBytes(report['host']['total'])}   GPU {FormatBytes(report['gpu']['total'])}")
+            for name, size in report["gpu"].items():
+                if name != "total":
+                    imgui.bullet_text(f"GPU {name}: {FormatBytes(size)}")
+            imgui.separator()
+            for group, entity in report["entities"].items():
+                imgui.text(f"{group}: {entity['active']} (+{entity['pooled']} pooled)  "
+                           f"host {FormatBytes(entity['host_bytes'])}  gpu {FormatBytes(entity['gpu_bytes'])}")
+            imgui.separator()
+            for name, mesh in report["meshes"].items():
+                imgui.text(f"{name}: {mesh['vertices']} verts  gpu {FormatBytes(mesh['gpu_bytes'])}  "
+                           f"ACMR {mesh['acmr'][0]:.2f} -> {mesh['acmr'][1]:.2f}")
+            for name, trace in report["traces"].items():
+                imgui.text(f"{name} peak {FormatBytes(trace['peak_bytes'])}  retained {FormatBytes(trace['retained_bytes'])}")
+            if imgui.button("Dump memory.json"):
+                self.DumpMemory("memory.json")
+        if imgui.collapsing_header("Timings", flags=imgui.TREE_NODE_DEFAULT_OPEN)[0]:
+            # CPU and GPU milliseconds per section, GPU times are a few frames behind
+            cpu = self.profiler.Averages()
+            gpu = self.profiler.gpu.Averages() if self.profiler.gpu is not None else {}
+            imgui.text(f"{'section':12s} {'cpu ms':>8s} {'gpu ms':>8s}")
+            for name, ms in cpu.items():
+                imgui.text(f"{name:12s} {ms:8.3f} " + (f"{gpu[name]:8.3f}" if name in gpu else f"{'-':>8s}"))
+            if self.profiler.gpu is not None and self.profiler.gpu.dropped:
+                imgui.text(f"GPU frames dropped: {self.profiler.gpu.dropped}")
+            if imgui.button("Export profile.json"):
+                self.profiler.Export("profile.json")
+        if imgui.collapsing_header("Shading", flags=imgui.TREE_NODE_DEFAULT_OPEN)[0]:
+            choices = ["auto"] + list(self.shadingPrograms)
+            changed, index = imgui.combo("All", choices.index(self.shading), choices)
+            if changed:
+                self.shading = choices[index]
+            for group in ("planets", "stations", "transporter", "pirates", "lasers"):
+                choices = ["global"] + ["auto"] + list(self.shadingPrograms)
+                current = self.shadingByGroup.get(group, "global")
+                changed, index = imgui.combo(group, choices.index(current), choices)
+                if changed:
+                    if choices[index] == "global":
+                        self.shadingByGroup.pop(group, None)
+                    else:
+                        self.shadingByGroup[group] = choices[index]
+            imgui.text("Last frame: " + ", ".join(f"{tier} {count}" for tier, count in self.shadingCounts.items()))
+        if imgui.collapsing_header("Occlusion", flags=imgui.TREE_NODE_DEFAULT_OPEN)[0]:
+            changed, self.occlusion.enabled = imgui.checkbox("Occlusion culling", self.occlusion.enabled)
+            if self.occlusion.enabled:
+                for group, (tested, offscreen, hidden) in self.occlusion.stats.items():
+                    imgui.text(f"{group}: {tested - offscreen} on screen, {hidden} occluded, {offscreen} off screen")
+                values = self.profiler.Values()
+                onscreen = values.get("occlusion_tested", {}).get("mean", 0.0) - values.get("occlusion_offscreen", {}).get("mean", 0.0)
+                if onscreen > 0:
+                    rate = values["occlusion_hidden"]["mean"] / onscreen
+                    imgui.text(f"Occlusion hit rate {100.0 * rate:.1f}% of on-screen objects over {len(self.profiler.values)} frames")
+        if imgui.collapsing_header("GL calls", flags=imgui.TREE_NODE_DEFAULT_OPEN)[0]:
+            changed, enabled = imgui.checkbox("Count GL calls", self.glStats.enabled)
+            if changed:
+                self.glStats.Install() if enabled else self.glStats.Uninstall()
+            if self.glStats.enabled:
+                last = self.glStats.Last()
+                imgui.text(f"Last frame: {last['total']} calls")
+                for category, count in sorted(last["calls"].items()):
+                    redundant = last["redundant"].get(category, 0)
+                    imgui.bullet_text(f"{category}: {count}" + (f"  ({redundant} redundant)" if redundant else ""))
+                if imgui.button("Export glstats.json"):
+                    self.glStats.Export("glstats.json")
+        if imgui.collapsing_header("GL resources", flags=imgui.TREE_NODE_DEFAULT_OPEN)[0]:
+            counts = resources.Counts()
+            imgui.text("Live: " + ", ".join(f"{name} {count}" for name, count in sorted(counts["objects"].items())))
+            imgui.text("GL names: " + ", ".join(f"{kind} {count}" for kind, count in sorted(counts["gl_names"].items())))
+            imgui.text(f"Pending {counts['pending']}   deleted {sum(counts['deleted'].values())}")
+        imgui.end()
+
+    def DrawHUD(self):
+        # START ImGui rendering properly (BEFORE any ImGui drawing)
+        imgui.new_frame()
+        self.DrawCrosshair()
+        if self.showDebug:
+            self.DrawDebugPanel()
+
+        if (self.destination_station is not None) and (self.objects.get("transporter") is not None):
+            # Get positions (world positions)
+            transporter_pos = self.objects["transporter"].properties["position"]
+            destination_pos = self.destination_station.properties["position"]
+            # Compute horizontal difference (using X and Z) for direction.
+            diff_x = destination_pos[0] - transporter_pos[0]
+            diff_z = destination_pos[2] - transporter_pos[2]
+            angle = np.arctan2(diff_z, diff_x)  # angle in radians
+                
+            # Compute elevation difference (Y difference)
+            elev_diff = destination_pos[1] - transporter_pos[1]
+                
+            # Get distance to destination for display
+            distance = np.sqrt(diff_x**2 + diff_z**2 + elev_diff**2)
+                
+            # Define arrow's center in a corner (top-right) for better visibility
+            arrow_center = (self.width - 100, 100)
+                
+            # Make arrow much bigger for better visibility
+            arrow_size = 40
+            local_points = [
+                (0, -arrow_size*2), 
+                (-arrow_size, arrow_size), 
+                (arrow_size, arrow_size)
+            ]
+                
+            # Set arrow color based on elevation difference
+            if elev_diff > 1.0:
+                col_u32 = imgui.get_color_u32_rgba(1.0, 0.0, 0.0, 1.0)  # red: destination is higher
+            elif elev_diff < -1.0:
+                col_u32 = imgui.get_color_u32_rgba(0.0, 0.0, 1.0, 1.0)  # blue: destination is lower
+            else:
+                col_u32 = imgui.get_color_u32_rgba(1.0, 1.0, 0.0, 1.0)  # yellow: nearly equal
+                
+            # Fixed rotation calculation
+            cos_a = np.cos(angle)
+            sin_a = np.sin(angle)
+                
+            # Rotate and translate each point correctly
+            p1x = local_points[0][0] * cos_a - local_points[0][1] * sin_a + arrow_center[0]
+            p1y = local_points[0][0] * sin_a + local_points[0][1] * cos_a + arrow_center[1]
+            p2x = local_points[1][0] * cos_a - local_points[1][1] * sin_a + arrow_center[0]
+            p2y = local_points[1][0] * sin_a + local_points[1][1] * cos_a + arrow_center[1]
+            p3x = local_points[2][0] * cos_a - local_points[2][1] * sin_a + arrow_center[0]
+            p3y = local_points[2][0] * sin_a + local_points[2][1] * cos_a + arrow_center[1]
+                
+            # Draw the filled triangle
+            draw_list = imgui.get_foreground_draw_list()
+            draw_list.add_triangle_filled(p1x, p1y, p2x, p2y, p3x, p3y, col_u32)
+                
+            # Add distance indicator text
+            draw_list.add_text(arrow_center[0] - 50, arrow_center[1] + 40, 
+                            imgui.get_color_u32_rgba(1.0, 1.0, 1.0, 1.0), 
+                            f"Distance: {distance:.1f} units")
+                
+        imgui.render()
+        self.gui.render(imgui.get_draw_data())
+
+    def ShadingTier(self, group, obj, eye):
+        tier = self.shadingByGroup.get(group, self.shading)
+        if tier != "auto":
+            return tier
+        distance = np.linalg.norm(np.asarray(obj.properties["position"], dtype=np.float64) - eye)
+        distance /= float(np.max(obj.properties["scale"]))
+        for limit, tier in self.shadingTiers:
+            if distance < limit:
+                return tier
+
+    def DrawGroup(self, group, objects, origin):
+        # The camera is the floating origin, so it also is the eye for the distance tiers
+        for obj in objects:
+            tier = self.ShadingTier(group, obj, origin)
+            self.shadingCounts[tier] += 1
+            obj.shader = self.shadingPrograms[tier]
+            obj.Draw(origin)
+
     def DrawScene(self):
         if self.screen == 1: 
 
             for shader in (self.shaders):
                 self.camera.Update(shader)
+                # Lighting happens in camera-relative space as well
+                origin = self.camera.origin
+                lightPos = np.array([100.0, 100.0, 100.0]) - origin
+                viewPos = self.camera.position - origin
                 lightPosLocation = glGetUniformLocation(shader.ID, "lightPos".encode('utf-8'))
-                glUniform3f(lightPosLocation, 100.0, 100.0, 100.0)
+                glUniform3f(lightPosLocation, lightPos[0], lightPos[1], lightPos[2])
                 viewPosLocation = glGetUniformLocation(shader.ID, "viewPos".encode('utf-8'))
-                glUniform3f(viewPosLocation, self.camera.position[0], self.camera.position[1], self.camera.position[2])
+                glUniform3f(viewPosLocation, viewPos[0], viewPos[1], viewPos[2])
                 glUniform1f(glGetUniformLocation(shader.ID, "ambientStrength".encode('utf-8')), 0.3)
                 glUniform1f(glGetUniformLocation(shader.ID, "specularStrength".encode('utf-8')), 0.8)
                 glUniform1f(glGetUniformLocation(shader.ID, "shininess".encode('utf-8')), 64.0)
 
-            for planet_obj in self.objects.get("planets", []):
-                planet_obj.Draw()
+            self.resolution.Begin()
+
+            # Backdrop first, it never writes depth
+            with self.profiler.Section("stars", gpu=True):
+                self.starfield.Draw(self.camera)
+
+            origin = self.camera.origin
+            self.shadingCounts = dict.fromkeys(self.shadingPrograms, 0)
+            with self.profiler.Section("planets", gpu=True):
+                self.DrawGroup("planets", self.objects.get("planets", []), origin)
             
-            for station_obj in self.objects.get("stations", []):
-                station_obj.Draw()
+            # Planets are the occluders: query the rest against them, using earlier results
+            with self.profiler.Section("occlusion", gpu=True):
+                draw = self.occlusion.Test({"stations": self.objects.get("stations", []),
+                                            "pirates": self.objects.get("pirates", [])}, self.camera)
+            if self.occlusion.enabled:
+                stats = np.array(list(self.occlusion.stats.values())).sum(axis=0)
+                self.profiler.Set("occlusion_tested", int(stats[0]))
+                self.profiler.Set("occlusion_offscreen", int(stats[1]))
+                self.profiler.Set("occlusion_hidden", int(stats[2]))
+
+            with self.profiler.Section("stations", gpu=True):
+                self.DrawGroup("stations", draw["stations"], origin)
             
-            if self.objects.get("transporter") is not None:
-                self.objects["transporter"].Draw()
+            with self.profiler.Section("transporter", gpu=True):
+                if self.objects.get("transporter") is not None:
+                    self.DrawGroup("transporter", [self.objects["transporter"]], origin)
             
-            for pirate_obj in self.objects.get("pirates", []):
-                pirate_obj.Draw()
+            with self.profiler.Section("pirates", gpu=True):
+                self.DrawGroup("pirates", draw["pirates"], origin)
             
-            for laser_obj in self.objects.get("lasers", []):
-                laser_obj.Draw()
-
-            # START ImGui rendering properly (BEFORE any ImGui drawing)
-            imgui.new_frame()
-            self.DrawCrosshair()
-
-            if (self.destination_station is not None) and (self.objects.get("transporter") is not None):
-                # Get positions (world positions)
-                transporter_pos = self.objects["transporter"].properties["position"]
-                destination_pos = self.destination_station.properties["position"]
-                # Compute horizontal difference (using X and Z) for direction.
-                diff_x = destination_pos[0] - transporter_pos[0]
-                diff_z = destination_pos[2] - transporter_pos[2]
-                angle = np.arctan2(diff_z, diff_x)  # angle in radians
-                
-                # Compute elevation difference (Y difference)
-                elev_diff = destination_pos[1] - transporter_pos[1]
-                
-                # Get distance to destination for display
-                distance = np.sqrt(diff_x**2 + diff_z**2 + elev_diff**2)
-                
-                # Define arrow's center in a corner (top-right) for better visibility
-                arrow_center = (self.width - 100, 100)
-                
-                # Make arrow much bigger for better visibility
-                arrow_size = 40
-                local_points = [
-                    (0, -arrow_size*2), 
-                    (-arrow_size, arrow_size), 
-                    (arrow_size, arrow_size)
-                ]
-                
-                # Set arrow color based on elevation difference
-                if elev_diff > 1.0:
-                    col_u32 = imgui.get_color_u32_rgba(1.0, 0.0, 0.0, 1.0)  # red: destination is higher
-                elif elev_diff < -1.0:
-                    col_u32 = imgui.get_color_u32_rgba(0.0, 0.0, 1.0, 1.0)  # blue: destination is lower
-                else:
-                    col_u32 = imgui.get_color_u32_rgba(1.0, 1.0, 0.0, 1.0)  # yellow: nearly equal
-                
-                # Fixed rotation calculation
-                cos_a = np.cos(angle)
-                sin_a = np.sin(angle)
-                
-                # Rotate and translate each point correctly
-                p1x = local_points[0][0] * cos_a - local_points[0][1] * sin_a + arrow_center[0]
-                p1y = local_points[0][0] * sin_a + local_points[0][1] * cos_a + arrow_center[1]
-                p2x = local_points[1][0] * cos_a - local_points[1][1] * sin_a + arrow_center[0]
-                p2y = local_points[1][0] * sin_a + local_points[1][1] * cos_a + arrow_center[1]
-                p3x = local_points[2][0] * cos_a - local_points[2][1] * sin_a + arrow_center[0]
-                p3y = local_points[2][0] * sin_a + local_points[2][1] * cos_a + arrow_center[1]
-                
-                # Draw the filled triangle
-                draw_list = imgui.get_foreground_draw_list()
-                draw_list.add_triangle_filled(p1x, p1y, p2x, p2y, p3x, p3y, col_u32)
-                
-                # Add distance indicator text
-                draw_list.add_text(arrow_center[0] - 50, arrow_center[1] + 40, 
-                                imgui.get_color_u32_rgba(1.0, 1.0, 1.0, 1.0), 
-                                f"Distance: {distance:.1f} units")
-                
-            imgui.render()
-            self.gui.render(imgui.get_draw_data())
+            with self.profiler.Section("lasers", gpu=True):
+                self.DrawGroup("lasers", self.objects.get("lasers", []), origin)
+            for tier, count in self.shadingCounts.items():
+                self.profiler.Set(f"shading_{tier}", count)
+
+            # Stretch the scene onto the window, the HUD below stays at native resolution
+            with self.profiler.Section("upscale", gpu=True):
+                self.resolution.End()
+
+            # Radar: the texture is only re-rendered when stale, the quad is drawn every frame
+            with self.profiler.Section("minimap", gpu=True):
+                transporter = self.objects.get("transporter")
+                if transporter is not None:
+                    self.minimap.Update(self.objects, self.destination_station,
+                                        transporter.properties["position"], self.currentTime)
+                    self.minimap.Draw(self.width, self.height)
+
+            with self.profiler.Section("hud", gpu=True):
+                self.DrawHUD()
 
             # self.gameState["transporter"].Draw()
-            # self.gameState["stars"].Draw()
             # self.gameState["arrow"].Draw()
 
             # if self.gameState["transporter"].properties["view"] == 2: # Conditionally draw crosshair
@@ -1,21 +1,94 @@
-from OpenGL.GL import *
-from utils.window_manager import Window
-from game import Game
+import argparse
+import time as clock
+import numpy as np
+from utils import runtime
+runtime.Configure() # must run before the first OpenGL import
+
+with runtime.trace.Span("imports"):
+    from OpenGL.GL import *
+    from utils.window_manager import Window
+    from game import Game
+    from utils.replay import Recorder, InputLog, ApplyToImGui
 
 class App:
-    def __init__(self):
-        self.window = Window()
-        self.game = Game(self.window.windowHeight, self.window.windowWidth, self.window.impl)
+    def __init__(self, record=None, replay=None, speed=1.0):
+        with runtime.trace.Span("window"):
+            self.window = Window()
+        with runtime.trace.Span("game init"):
+            self.game = Game(self.window.windowHeight, self.window.windowWidth, self.window.impl)
+        # Menus and end screens are static: only redraw on input or a screen change
+        self.idleTimeout = 0.5 # seconds
+        self.settleFrames = 2 # frames drawn after each event so ImGui sees press and release
+
+        # Input recording / replay: the world seed is fixed for the whole session so every
+        # round can be regenerated from the log
+        self.recorder = None
+        self.replay = None
+        self.speed = speed # replay speed, 0 runs as fast as possible
+        if replay is not None:
+            self.replay = InputLog(replay)
+            self.game.worldSeed = self.replay.seed
+            if (self.replay.width, self.replay.height) != (self.window.windowWidth, self.window.windowHeight):
+                runtime.Log(f"Replay was recorded at {self.replay.width}x{self.replay.height}, menus may not line up")
+        elif record is not None:
+            if self.game.worldSeed is None:
+                self.game.worldSeed = int(np.random.default_rng().integers(2**31))
+            self.recorder = Recorder(record, self.game.worldSeed, self.window.windowWidth, self.window.windowHeight)
 
     def RenderLoop(self):
 
+        profiler = self.game.profiler
+        pending = self.settleFrames
+        frame = 0
+        replayStart = None
         while self.window.IsOpen():
-            inputs, time = self.window.StartFrame(0.0, 0.0, 0.0, 1.0)
+            if self.replay is not None and frame == len(self.replay):
+                break
+            if self.replay is None and self.game.IsIdle():
+                if pending == 0:
+                    if not self.window.WaitForActivity(self.idleTimeout):
+                        continue
+                    pending = self.settleFrames
+                pending -= 1
+            screen = self.game.screen
+
+            profiler.BeginFrame()
+            with profiler.Section("input"):
+                inputs, time = self.window.StartFrame(0.0, 0.0, 0.0, 1.0)
+                if self.replay is not None:
+                    inputs, time = self.replay.Frame(frame)
+                    ApplyToImGui(inputs)
+                    if replayStart is None:
+                        replayStart = (clock.perf_counter(), time["currentTime"])
+                    if self.speed > 0:
+                        due = replayStart[0] + (time["currentTime"] - replayStart[1]) / self.speed
+                        clock.sleep(max(0.0, due - clock.perf_counter()))
+                elif self.recorder is not None:
+                    self.recorder.Record(inputs, time)
             self.game.ProcessFrame(inputs, time)
-            self.window.EndFrame()
-        
+            frame += 1
+            with profiler.Section("swap"):
+                self.window.EndFrame()
+            with profiler.Section("release"):
+                self.game.FinishFrame()
+            profiler.EndFrame()
+            if self.game.screen != screen:
+                pending = self.settleFrames
+            runtime.trace.Milestone("first frame")
+            if self.game.screen == 1:
+                runtime.trace.Milestone("first gameplay frame")
+
+        if self.recorder is not None:
+            self.recorder.Close()
+            runtime.Log(f"Recorded {self.recorder.frames} frames")
+        self.game.Delete()
         self.window.Close()
 
 if __name__ == "__main__":
-    app = App()
+    parser = argparse.ArgumentParser(description="Space Heist")
+    parser.add_argument("--record", default=None, help="write the session's inputs to this log")
+    parser.add_argument("--replay", default=None, help="play an input log back instead of reading input")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 runs unpaced")
+    args = parser.parse_args()
+    app = App(args.record, args.replay, args.speed)
     app.RenderLoop()
\ No newline at end of file
@@ -0,0 +1,227 @@
+#montecarlo.py
+# Monte Carlo balancing runner: plays many headless rounds with scripted or seeded policies in a
+# process pool and writes win/loss rates and times to outcome per parameter set. Only the
+# simulation runs (Game.UpdateScene), nothing is drawn. Each worker owns a tiny offscreen GL
+# context and one Game, so meshes are loaded once per worker and reused by every round.
+#
+#   python montecarlo.py --episodes 2000 --policy autopilot --set chaseSpeed=40,50,60 \
+#       --set piratesPerSector=0.2,0.3 --out balance.json
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+
+from utils.offscreen import SelectPlatform, BACKENDS
+from benchmark import BlankInputs
+
+OUTCOMES = {2: "won", 3: "lost"}
+
+# Policies: called once per step with the game, return the inputs for that step.
+# Seeded ones draw from their own generator so an episode is a function of its seed.
+class Cruise:
+    def __init__(self, rng):
+        pass
+
+    def __call__(self, game, step):
+        inputs = BlankInputs()
+        inputs["SPACE"] = True
+        return inputs
+
+class RandomPilot:
+    def __init__(self, rng, hold=(15, 90)):
+        # Holds a random combination of steering keys for a random number of steps
+        self.rng = rng
+        self.hold = hold
+        self.keys = []
+        self.until = 0
+
+    def __call__(self, game, step):
+        if step >= self.until:
+            self.keys = [key for key in ("W", "S", "A", "D", "Q", "E") if self.rng.random() < 0.25]
+            self.until = step + int(self.rng.integers(*self.hold))
+        inputs = BlankInputs()
+        inputs["SPACE"] = True
+        for key in self.keys:
+            inputs[key] = True
+        return inputs
+
+class Autopilot:
+    def __init__(self, rng, deadband=0.02, noise=0.05):
+        # Steers straight at the destination station, with some seeded jitter on the
+        # steering threshold so episodes of the same world differ slightly
+        self.rng = rng
+        self.deadband = deadband
+        self.noise = noise
+
+    def __call__(self, game, step):
+        inputs = BlankInputs()
+        inputs["SPACE"] = True
+        transporter = game.objects["transporter"]
+        orientation = transporter.properties.get("orientation")
+        if orientation is None:
+            return inputs
+        offset = game.destination_station.properties["position"] - transporter.properties["position"]
+        local = orientation.T @ (offset / max(np.linalg.norm(offset), 1e-9))
+        threshold = self.deadband * (1.0 + self.noise * self.rng.standard_normal())
+        # Local -z is forward, +x right, +y up
+        inputs["A"] = local[0] < -threshold
+        inputs["D"] = local[0] > threshold
+        inputs["W"] = local[1] > threshold
+        inputs["S"] = local[1] < -threshold
+        if local[2] > 0 and not (inputs["A"] or inputs["D"]):
+            inputs["A"] = True  # target behind: turn around
+        return inputs
+
+POLICIES = {"cruise": Cruise, "random": RandomPilot, "autopilot": Autopilot}
+
+worker = {}
+
+def InitWorker(backend, profile):
+    # Runs once per process: the GL context, shaders and meshes live as long as the worker
+    SelectPlatform(backend)
+    from utils import runtime
+    runtime.Configure(profile)
+    from utils.offscreen import OffscreenContext
+    from game import Game
+    start = time.perf_counter()
+    worker["context"] = OffscreenContext(backend, 64, 64)
+    game = Game(64, 64, None)
+    game.profiler.enabled = False
+    worker["game"] = game
+    worker["init_s"] = time.perf_counter() - start
+
+def SetParameter(game, name, value):
+    # "maxSpeed.3rd" sets one entry of a dict attribute
+    if "." in name:
+        head, key = name.split(".", 1)
+        getattr(game, head)[key] = value
+    else:
+        setattr(game, name, value)
+
+def RunEpisode(task):
+    config, params, seed, policy_name, dt, max_time = task
+    game = worker["game"]
+    for name, value in params.items():
+        SetParameter(game, name, value)
+    start = time.perf_counter()
+    game.worldSeed = seed
+    game.screen = 1
+    game.InitScene()
+    policy = POLICIES[policy_name](np.random.default_rng([seed, 3]))
+    steps = int(np.ceil(max_time / dt))
+    step = 0
+    while step < steps and game.screen == 1:
+        game.UpdateScene(policy(game, step), {"currentTime": step * dt, "deltaTime": dt})
+        step += 1
+    game.FinishFrame()
+    elapsed = time.perf_counter() - start
+    return {
+        "config": config,
+        "seed": seed,
+        "outcome": OUTCOMES.get(game.screen, "timeout"),
+        "time": step * dt,
+        "steps": step,
+        "wall_s": elapsed,
+        "steps_per_s": step / elapsed if elapsed > 0 else 0.0,
+        "worker": os.getpid(),
+    }
+
+def ParseGrid(settings):
+    # ["chaseSpeed=40,50", "piratesPerSector=0.3"] -> list of parameter dicts (cartesian product)
+    names, choices = [], []
+    for setting in settings:
+        name, _, values = setting.partition("=")
+        names.append(name)
+        choices.append([float(value) for value in values.split(",")])
+    return [dict(zip(names, combination)) for combination in itertools.product(*choices)]
+
+def Stats(values):
+    if not values:
+        return None
+    values = np.asarray(values)
+    return {"mean": float(values.mean()), "median": float(np.median(values)),
+            "p90": float(np.percentile(values, 90)), "min": float(values.min()), "max": float(values.max())}
+
+def Summarize(configs, episodes):
+    summary = []
+    for index, params in enumerate(configs):
+        results = [episode for episode in episodes if episode["config"] == index]
+        count = len(results)
+        by_outcome = {outcome: [r["time"] for r in results if r["outcome"] == outcome]
+                      for outcome in ("won", "lost", "timeout")}
+        summary.append({
+            "params": params,
+            "episodes": count,
+            "win_rate": len(by_outcome["won"]) / count,
+            "loss_rate": len(by_outcome["lost"]) / count,
+            "timeout_rate": len(by_outcome["timeout"]) / count,
+            "time_to_win": Stats(by_outcome["won"]),
+            "time_to_loss": Stats(by_outcome["lost"]),
+            "steps_per_s": Stats([r["steps_per_s"] for r in results]),
+        })
+    return summary
+
+def ParseArgs(argv):
+    parser = argparse.ArgumentParser(description="Headless Monte Carlo balancing runs")
+    parser.add_argument("--backend", choices=BACKENDS, default="egl")
+    parser.add_argument("--profile", default="production", help="runtime profile of the workers")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="autopilot")
+    parser.add_argument("--episodes", type=int, default=100, help="rounds per parameter set")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="first world seed, every parameter set plays the same seeds")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="Game attribute to sweep, e.g. chaseSpeed=40,50 or maxSpeed.3rd=50,60")
+    parser.add_argument("--dt", type=float, default=1.0 / 30.0, help="simulation step")
+    parser.add_argument("--max-time", type=float, default=300.0, help="simulated seconds before a timeout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="montecarlo.json", help="summary file")
+    parser.add_argument("--keep-episodes", action="store_true", help="also write every episode's result")
+    return parser.parse_args(argv)
+
+def Run(args):
+    configs = ParseGrid(args.set)
+    tasks = [(index, params, args.seed + episode, args.policy, args.dt, args.max_time)
+             for index, params in enumerate(configs) for episode in range(args.episodes)]
+    # Spawned workers: PyOpenGL must not have picked a platform before SelectPlatform runs
+    context = multiprocessing.get_context("spawn")
+    chunksize = max(1, len(tasks) // (args.workers * 8))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=InitWorker,
+                             initargs=(args.backend, args.profile)) as pool:
+        episodes = list(pool.map(RunEpisode, tasks, chunksize=chunksize))
+    wall = time.perf_counter() - start
+    steps = sum(episode["steps"] for episode in episodes)
+    report = {
+        "policy": args.policy,
+        "dt": args.dt,
+        "max_time": args.max_time,
+        "workers": args.workers,
+        "episodes": len(episodes),
+        "wall_s": wall,
+        "episodes_per_s": len(episodes) / wall,
+        "steps_per_s": steps / wall,
+        "configs": Summarize(configs, episodes),
+    }
+    if args.keep_episodes:
+        report["episode_results"] = episodes
+    return report
+
+def main(argv=None):
+    args = ParseArgs(sys.argv[1:] if argv is None else argv)
+    report = Run(args)
+    print(f"{report['episodes']} episodes on {report['workers']} workers in {report['wall_s']:.1f} s "
+          f"({report['episodes_per_s']:.2f} episodes/s, {report['steps_per_s']:.0f} steps/s)")
+    for config in report["configs"]:
+        won = config["time_to_win"]
+        print(f"  {config['params']}  won {config['win_rate']:.1%}  lost {config['loss_rate']:.1%}  "
+              f"timeout {config['timeout_rate']:.1%}" + (f"  win in {won['median']:.1f} s" if won else ""))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
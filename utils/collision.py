@@ -0,0 +1,320 @@
+#collision.py
+import numpy as np
+
+# Mesh-accurate collision. Every collidable mesh gets a BVH (an AABB tree over its triangles)
+# built once at load time in object space. Queries are moved into the object space of the
+# entity (position, orientation or rotation, scale) and first rejected against the world
+# space bounding sphere, so most pairs never reach the tree.
+
+class BVH:
+    def __init__(self, triangles, leaf_size=8):
+        # triangles: (n, 3, 3) object space vertices, or a flat position array (non-indexed mesh)
+        triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+        n = len(triangles)
+        tri_min = triangles.min(axis=1)
+        tri_max = triangles.max(axis=1)
+        centroids = 0.5 * (tri_min + tri_max)
+        order = np.arange(n)
+
+        mins, maxs, lefts, rights, starts, counts = [], [], [], [], [], []
+        def NewNode():
+            for array in (mins, maxs):
+                array.append(np.zeros(3))
+            for array in (lefts, rights, starts, counts):
+                array.append(-1)
+            return len(lefts) - 1
+
+        # Top-down median split on the longest centroid axis
+        stack = [(NewNode(), 0, n)]
+        while stack:
+            node, start, end = stack.pop()
+            idx = order[start:end]
+            mins[node] = tri_min[idx].min(axis=0) if len(idx) else np.zeros(3)
+            maxs[node] = tri_max[idx].max(axis=0) if len(idx) else np.zeros(3)
+            if end - start <= leaf_size:
+                starts[node] = start
+                counts[node] = end - start
+                continue
+            c = centroids[idx]
+            axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+            half = (end - start) // 2
+            order[start:end] = idx[np.argpartition(c[:, axis], half)]
+            left, right = NewNode(), NewNode()
+            lefts[node], rights[node] = left, right
+            stack.append((left, start, start + half))
+            stack.append((right, start + half, end))
+
+        self.triangles = triangles[order]
+        self.nodeMin = np.array(mins)
+        self.nodeMax = np.array(maxs)
+        self.left = np.array(lefts)
+        self.right = np.array(rights)
+        self.start = np.array(starts)
+        self.count = np.array(counts)
+        # Leaf triangles padded to leaf_size with NaN (never hit) for batched leaf tests
+        self.leafTriangles = np.full((len(lefts), leaf_size, 3, 3), np.nan)
+        for node in np.flatnonzero(self.left < 0):
+            self.leafTriangles[node, :self.count[node]] = self.Leaf(node)
+        # Bounding sphere for the early-out
+        self.center = 0.5 * (self.nodeMin[0] + self.nodeMax[0])
+        self.radius = float(np.linalg.norm(triangles.reshape(-1, 3) - self.center, axis=1).max()) if n else 0.0
+
+    @property
+    def num_nodes(self):
+        return len(self.left)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.triangles, self.leafTriangles, self.nodeMin, self.nodeMax,
+                                              self.left, self.right, self.start, self.count))
+
+    def Leaf(self, node):
+        return self.triangles[self.start[node]:self.start[node] + self.count[node]]
+
+    def QuerySphere(self, center, radius):
+        # True when the sphere touches any triangle, object space
+        center = np.asarray(center, dtype=np.float64)
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            closest = np.clip(center, self.nodeMin[node], self.nodeMax[node])
+            if np.dot(closest - center, closest - center) > radius * radius:
+                continue
+            if self.left[node] < 0:
+                if SphereHitsTriangles(center, radius, self.Leaf(node)).any():
+                    return True
+            else:
+                stack.append(self.left[node])
+                stack.append(self.right[node])
+        return False
+
+    def QuerySegment(self, p0, p1):
+        # True when the segment p0-p1 crosses any triangle, object space
+        p0 = np.asarray(p0, dtype=np.float64)
+        direction = np.asarray(p1, dtype=np.float64) - p0
+        with np.errstate(divide="ignore"):
+            inverse = 1.0 / direction
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not SegmentHitsBox(p0, direction, inverse, self.nodeMin[node], self.nodeMax[node]):
+                continue
+            if self.left[node] < 0:
+                if SegmentsHitTriangles(p0, direction, self.Leaf(node)).any():
+                    return True
+            else:
+                stack.append(self.left[node])
+                stack.append(self.right[node])
+        return False
+
+    def SegmentCrossings(self, p0, p1):
+        # Number of triangles the segment p0-p1 crosses, object space
+        p0 = np.asarray(p0, dtype=np.float64)
+        direction = np.asarray(p1, dtype=np.float64) - p0
+        with np.errstate(divide="ignore"):
+            inverse = 1.0 / direction
+        crossings = 0
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not SegmentHitsBox(p0, direction, inverse, self.nodeMin[node], self.nodeMax[node]):
+                continue
+            if self.left[node] < 0:
+                crossings += int(SegmentsHitTriangles(p0, direction, self.Leaf(node)).sum())
+            else:
+                stack.append(self.left[node])
+                stack.append(self.right[node])
+        return crossings
+
+    def Contains(self, point):
+        # Point inside the (closed) mesh, object space: odd number of crossings along a ray out
+        # of the bounds. Three axis rays vote, so one leaky seam in the models does not decide.
+        point = np.asarray(point, dtype=np.float64)
+        if np.any(point < self.nodeMin[0]) or np.any(point > self.nodeMax[0]):
+            return False
+        votes = 0
+        for axis in range(3):
+            end = point.copy()
+            end[axis] = self.nodeMax[0][axis] + 1.0
+            votes += self.SegmentCrossings(point, end) % 2
+            if axis == 1 and votes != 1:
+                break  # the first two agree, the third cannot change the outcome
+        return votes >= 2
+
+    def QueryBVH(self, other, matrix, offset):
+        # True when the two meshes intersect. `other` is moved into this object space by
+        # x -> matrix @ x + offset. Coplanar touching triangles are not reported.
+        # The two trees are walked together one level at a time, all node pairs of a level at once.
+        box_matrix = np.abs(matrix)
+        a = np.zeros(1, dtype=np.int64)
+        b = np.zeros(1, dtype=np.int64)
+        while len(a):
+            b_center = (0.5 * (other.nodeMin[b] + other.nodeMax[b])) @ matrix.T + offset
+            b_extent = (0.5 * (other.nodeMax[b] - other.nodeMin[b])) @ box_matrix.T
+            overlap = np.all(b_center - b_extent <= self.nodeMax[a], axis=1) & \
+                      np.all(b_center + b_extent >= self.nodeMin[a], axis=1)
+            a, b, b_extent = a[overlap], b[overlap], b_extent[overlap]
+            a_leaf = self.left[a] < 0
+            b_leaf = other.left[b] < 0
+            leaves = a_leaf & b_leaf
+            if leaves.any() and LeafPairsIntersect(self.leafTriangles[a[leaves]],
+                                                   other.leafTriangles[b[leaves]] @ matrix.T + offset):
+                return True
+            # Split the bigger node of every remaining pair
+            split_a = ~a_leaf & (b_leaf | (np.sum(self.nodeMax[a] - self.nodeMin[a], axis=1) >= 2.0 * np.sum(b_extent, axis=1)))
+            split_b = ~leaves & ~split_a
+            a = np.concatenate([self.left[a[split_a]], self.right[a[split_a]], a[split_b], a[split_b]])
+            b = np.concatenate([b[split_a], b[split_a], other.left[b[split_b]], other.right[b[split_b]]])
+        return False
+
+def SegmentHitsBox(origin, direction, inverse, box_min, box_max):
+    # Slab test for 0 <= t <= 1
+    with np.errstate(invalid="ignore"):
+        t0 = (box_min - origin) * inverse
+        t1 = (box_max - origin) * inverse
+    parallel = direction == 0
+    if np.any(parallel & ((origin < box_min) | (origin > box_max))):
+        return False
+    near = np.where(parallel, -np.inf, np.minimum(t0, t1)).max()
+    far = np.where(parallel, np.inf, np.maximum(t0, t1)).min()
+    return near <= far and far >= 0.0 and near <= 1.0
+
+def SegmentsHitTriangles(origins, directions, triangles):
+    # Moller-Trumbore for segments origin + t * direction, 0 <= t <= 1.
+    # origins and directions broadcast against the leading axes of triangles (..., 3, 3).
+    v0 = triangles[..., 0, :]
+    e1 = triangles[..., 1, :] - v0
+    e2 = triangles[..., 2, :] - v0
+    pvec = np.cross(directions, e2)
+    det = np.sum(e1 * pvec, axis=-1)
+    valid = np.abs(det) > 1e-12
+    inv_det = 1.0 / np.where(valid, det, 1.0)
+    tvec = origins - v0
+    u = np.sum(tvec * pvec, axis=-1) * inv_det
+    qvec = np.cross(tvec, e1)
+    v = np.sum(directions * qvec, axis=-1) * inv_det
+    t = np.sum(e2 * qvec, axis=-1) * inv_det
+    return valid & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t >= 0.0) & (t <= 1.0)
+
+def TrianglesIntersect(a, b):
+    # Any triangle of a crossing any triangle of b: an edge of one pierces the other
+    return LeafPairsIntersect(a[None], b[None])
+
+def LeafPairsIntersect(a, b, batch=256):
+    # a, b: (pairs, n, 3, 3), True when any pair has crossing triangles
+    def EdgesHit(edges_of, triangles):
+        starts = edges_of[:, :, None, :, :]
+        ends = np.roll(edges_of, -1, axis=2)[:, :, None, :, :]
+        return SegmentsHitTriangles(starts, ends - starts, triangles[:, None, :, None, :, :]).any()
+    for i in range(0, len(a), batch):
+        if EdgesHit(a[i:i + batch], b[i:i + batch]) or EdgesHit(b[i:i + batch], a[i:i + batch]):
+            return True
+    return False
+
+def SphereHitsTriangles(center, radius, triangles):
+    # Per triangle: the sphere touches the face interior or one of its edges
+    v0, v1, v2 = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    normal = np.cross(v1 - v0, v2 - v0)
+    nn = np.sum(normal * normal, axis=1)
+    safe_nn = np.where(nn > 0, nn, 1.0)
+    distance = np.sum((center - v0) * normal, axis=1)
+    projected = center - normal * (distance / safe_nn)[:, None]
+    inside = (nn > 0) & (distance * distance <= radius * radius * safe_nn)
+    for a, b in ((v0, v1), (v1, v2), (v2, v0)):
+        inside &= np.sum(np.cross(b - a, projected - a) * normal, axis=1) >= 0.0
+    hit = inside
+    for a, b in ((v0, v1), (v1, v2), (v2, v0)):
+        edge = b - a
+        length = np.sum(edge * edge, axis=1)
+        t = np.clip(np.sum((center - a) * edge, axis=1) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+        closest = a + edge * t[:, None] - center
+        hit |= np.sum(closest * closest, axis=1) <= radius * radius
+    return hit
+
+# Entity level queries. Entities are Objects whose mesh carries a `bvh`.
+
+def Orientation(properties):
+    # Same rotation the renderer uses: the orientation matrix if set, else Rz @ Ry @ Rx
+    if "orientation" in properties:
+        return np.asarray(properties["orientation"], dtype=np.float64)[:3, :3]
+    rx, ry, rz = np.asarray(properties["rotation"], dtype=np.float64)
+    cx, cy, cz = np.cos([rx, ry, rz])
+    sx, sy, sz = np.sin([rx, ry, rz])
+    Rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    Ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    Rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    return Rz @ Ry @ Rx
+
+def BoundingSphere(obj):
+    # World space center and radius
+    properties = obj.properties
+    scale = np.asarray(properties["scale"], dtype=np.float64)
+    center = np.asarray(properties["position"], dtype=np.float64) + Orientation(properties) @ (scale * obj.mesh.bvh.center)
+    return center, obj.mesh.bvh.radius * float(np.abs(scale).max())
+
+def ToObjectSpace(obj, points):
+    properties = obj.properties
+    local = (np.asarray(points, dtype=np.float64) - np.asarray(properties["position"], dtype=np.float64)) @ Orientation(properties)
+    return local / np.asarray(properties["scale"], dtype=np.float64)
+
+def SphereHitsObject(center, radius, obj):
+    # Scales are assumed uniform for spheres
+    center = np.asarray(center, dtype=np.float64)
+    sphere_center, sphere_radius = BoundingSphere(obj)
+    if np.linalg.norm(center - sphere_center) > radius + sphere_radius:
+        return False
+    scale = float(np.abs(obj.properties["scale"]).min())
+    return obj.mesh.bvh.QuerySphere(ToObjectSpace(obj, center), radius / scale)
+
+def SegmentHitsObject(p0, p1, obj):
+    p0 = np.asarray(p0, dtype=np.float64)
+    p1 = np.asarray(p1, dtype=np.float64)
+    sphere_center, sphere_radius = BoundingSphere(obj)
+    direction = p1 - p0
+    length = np.dot(direction, direction)
+    t = np.clip(np.dot(sphere_center - p0, direction) / length, 0.0, 1.0) if length > 0 else 0.0
+    if np.linalg.norm(p0 + t * direction - sphere_center) > sphere_radius:
+        return False
+    return obj.mesh.bvh.QuerySegment(*ToObjectSpace(obj, [p0, p1]))
+
+def SegmentsNearSpheres(p0, p1, centers, radii):
+    # Broad phase for many segments against many bounding spheres: (segments, spheres) bool
+    p0 = np.asarray(p0, dtype=np.float64).reshape(-1, 1, 3)
+    direction = np.asarray(p1, dtype=np.float64).reshape(-1, 1, 3) - p0
+    centers = np.asarray(centers, dtype=np.float64).reshape(1, -1, 3)
+    length = np.sum(direction * direction, axis=2)
+    t = np.clip(np.sum((centers - p0) * direction, axis=2) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+    closest = p0 + direction * t[:, :, None] - centers
+    return np.sum(closest * closest, axis=2) <= np.asarray(radii, dtype=np.float64) ** 2
+
+def ObjectsCollide(a, b, displacement=None):
+    # Surfaces crossing or one mesh inside the other. `displacement` is how far b moved relative
+    # to a during the last step (world space): the step is then swept in substeps no longer
+    # than half the smaller bounding radius, so a fast object cannot tunnel through a thin one.
+    center_a, radius_a = BoundingSphere(a)
+    center_b, radius_b = BoundingSphere(b)
+    displacement = np.zeros(3) if displacement is None else np.asarray(displacement, dtype=np.float64)
+    # Broad phase against the whole sweep of b's sphere
+    if not SegmentsNearSpheres(center_b - displacement, center_b, center_a, radius_a + radius_b)[0, 0]:
+        return False
+    # b's object space -> world -> a's object space
+    rotation_a, rotation_b = Orientation(a.properties), Orientation(b.properties)
+    scale_a = np.asarray(a.properties["scale"], dtype=np.float64)
+    scale_b = np.asarray(b.properties["scale"], dtype=np.float64)
+    matrix = (rotation_a.T @ rotation_b * scale_b) / scale_a[:, None]
+    offset = rotation_a.T @ (np.asarray(b.properties["position"], dtype=np.float64) -
+                             np.asarray(a.properties["position"], dtype=np.float64)) / scale_a
+    step = rotation_a.T @ displacement / scale_a
+    steps = int(np.clip(np.ceil(np.linalg.norm(displacement) / (0.5 * min(radius_a, radius_b))), 1, 32))
+    bvh_a, bvh_b = a.mesh.bvh, b.mesh.bvh
+    # Containment only at the end of the step, getting in or out on the way crosses the surface
+    if np.linalg.norm(center_b - center_a) <= radius_a + radius_b:
+        if bvh_a.Contains(matrix @ bvh_b.center + offset) or bvh_b.Contains(np.linalg.solve(matrix, bvh_a.center - offset)):
+            return True
+    for i in range(steps):
+        # Latest position first, the common case of a plain overlap returns right away
+        if np.linalg.norm(center_b - displacement * (i / steps) - center_a) > radius_a + radius_b:
+            continue
+        if bvh_a.QueryBVH(bvh_b, matrix, offset - step * (i / steps)):
+            return True
+    return False
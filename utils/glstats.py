@@ -0,0 +1,124 @@
+#glstats.py
+import importlib
+import inspect
+import json
+import re
+from collections import Counter, deque
+import OpenGL.GL as GL
+
+# Optional GL call statistics. Install() replaces the GL functions a module calls (found in
+# its source) by counting wrappers in that module's namespace, Uninstall() puts the
+# originals back. Calls are counted per category and frame; binding the object that is
+# already bound (same program, VAO, buffer, texture or framebuffer twice in a row) is
+# counted as redundant. The wrappers cost a Python call each, so this is off by default.
+
+CATEGORIES = (
+    ("draw", r"glDraw"),
+    ("uniform_lookup", r"glGet(Uniform|Attrib)Location"),
+    ("uniform", r"glUniform"),
+    ("program", r"glUseProgram$"),
+    ("vao", r"glBindVertexArray$"),
+    ("buffer_bind", r"glBindBuffer$"),
+    ("buffer_upload", r"glBuffer(Sub)?Data$"),
+    ("texture", r"gl(BindTexture|ActiveTexture|Tex)"),
+    ("framebuffer", r"gl(BindFramebuffer|BlitFramebuffer|Viewport)"),
+    ("state", r"gl(Enable|Disable|Depth|Blend|Cull|Clear|PolygonMode|LineWidth|PointSize)"),
+    ("query", r"gl(Begin|End|Get)Query"),
+)
+BINDS = ("glUseProgram", "glBindVertexArray", "glBindBuffer", "glBindTexture", "glBindFramebuffer",
+         "glActiveTexture")
+MODULES = ("game", "utils.graphics", "utils.starfield", "utils.minimap", "utils.resolution", "utils.occlusion")
+
+def Category(name):
+    for category, pattern in CATEGORIES:
+        if re.match(pattern, name):
+            return category
+    return "other"
+
+class GLStats:
+    def __init__(self, modules=MODULES, history=300):
+        self.modules = modules
+        self.installed = {}  # (module, name) -> original function
+        self.counts = Counter()
+        self.redundant = Counter()
+        self.bound = {}  # (function, target) -> bound object
+        self.frames = deque(maxlen=history)
+
+    def Wrap(self, name, function):
+        category = Category(name)
+        counts = self.counts
+        if name in BINDS:
+            redundant, bound = self.redundant, self.bound
+            def wrapper(*args, **kwargs):
+                counts[category] += 1
+                key = (name, args[:-1])
+                if key in bound and bound[key] == args[-1]:
+                    redundant[category] += 1
+                bound[key] = args[-1]
+                return function(*args, **kwargs)
+        elif name.startswith("glDelete"):
+            def wrapper(*args, **kwargs):
+                # Deleting unbinds, and GL may hand the names out again
+                counts[category] += 1
+                self.bound.clear()
+                return function(*args, **kwargs)
+        else:
+            def wrapper(*args, **kwargs):
+                counts[category] += 1
+                return function(*args, **kwargs)
+        return wrapper
+
+    def Install(self):
+        if self.installed:
+            return
+        for module_name in self.modules:
+            module = importlib.import_module(module_name)
+            for name in sorted(set(re.findall(r"\bgl[A-Z]\w*", inspect.getsource(module)))):
+                function = module.__dict__.get(name)
+                if function is None or function is not GL.__dict__.get(name):
+                    continue
+                self.installed[(module, name)] = function
+                setattr(module, name, self.Wrap(name, function))
+        self.bound.clear()
+
+    def Uninstall(self):
+        for (module, name), function in self.installed.items():
+            setattr(module, name, function)
+        self.installed = {}
+
+    @property
+    def enabled(self):
+        return bool(self.installed)
+
+    def EndFrame(self):
+        # Closes the frame's counters; other code (ImGui) may have changed the bindings
+        # since, so the bound state starts over
+        frame = {"calls": dict(self.counts), "redundant": dict(self.redundant), "total": sum(self.counts.values())}
+        self.frames.append(frame)
+        self.counts.clear()
+        self.redundant.clear()
+        self.bound.clear()
+        return frame
+
+    def Last(self):
+        return self.frames[-1] if self.frames else {"calls": {}, "redundant": {}, "total": 0}
+
+    def Summary(self):
+        # Mean calls per frame for every category
+        frames = len(self.frames)
+        if not frames:
+            return {}
+        calls, redundant = Counter(), Counter()
+        for frame in self.frames:
+            calls.update(frame["calls"])
+            redundant.update(frame["redundant"])
+        summary = {category: {"calls": count / frames, "redundant": redundant[category] / frames}
+                   for category, count in sorted(calls.items())}
+        summary["total"] = {"calls": sum(calls.values()) / frames, "redundant": sum(redundant.values()) / frames}
+        return summary
+
+    def Export(self, path):
+        report = {"frames": len(self.frames), "summary": self.Summary(), "history": list(self.frames)}
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
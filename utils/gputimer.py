@@ -0,0 +1,124 @@
+#gputimer.py
+import ctypes
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from OpenGL.GL import *
+from utils.resources import manager as resources
+
+# GPU pass times from GL_TIME_ELAPSED queries. Every frame gets its own slot of query
+# objects in a ring of `latency + 1` slots; a frame's results are read once the GPU has
+# finished it, usually `latency` frames later, so reading never stalls the pipeline.
+# TIME_ELAPSED queries cannot nest: a section opened inside another one is not timed.
+
+MAX_PLAUSIBLE_NS = 10**9  # some drivers (llvmpipe) return garbage for a query's first use
+
+class GPUTimer:
+    def __init__(self, latency=3, history=300):
+        self.slots = [[] for _ in range(latency + 1)]  # per frame: [(name, query), ...] in issue order
+        self.frameIds = [0] * (latency + 1)
+        self.free = []
+        self.active = False
+        self.frame = 0
+        self.frames = deque(maxlen=history)  # (frame number, {name: seconds})
+        self.dropped = 0
+        self.result = ctypes.c_uint64(0)
+        resources.Track(self)
+
+    def Handles(self):
+        return [("query", query) for slot in self.slots for _, query in slot] + [("query", query) for query in self.free]
+
+    def Query(self):
+        if not self.free:
+            self.free.extend(int(query) for query in np.atleast_1d(glGenQueries(8)))
+        return self.free.pop()
+
+    @contextmanager
+    def Section(self, name):
+        if self.active:
+            yield
+            return
+        query = self.Query()
+        self.slots[self.frame % len(self.slots)].append((name, query))
+        self.active = True
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        try:
+            yield
+        finally:
+            glEndQuery(GL_TIME_ELAPSED)
+            self.active = False
+
+    def Ready(self, slot):
+        # Queries finish in order, the last one being available means the whole frame is
+        return bool(glGetQueryObjectiv(slot[-1][1], GL_QUERY_RESULT_AVAILABLE))
+
+    def Read(self, index):
+        slot = self.slots[index]
+        times = {}
+        for name, query in slot:
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(self.result))
+            if self.result.value <= MAX_PLAUSIBLE_NS:
+                times[name] = times.get(name, 0.0) + self.result.value * 1e-9
+        self.frames.append((self.frameIds[index], times))
+        self.Recycle(index)
+
+    def Recycle(self, index):
+        self.free.extend(query for _, query in self.slots[index])
+        self.slots[index] = []
+
+    def Collect(self, wait=False):
+        # Reads every finished frame, oldest first; wait=True blocks until all are done,
+        # including the frame in progress
+        pending = sorted((self.frameIds[index], index) for index, slot in enumerate(self.slots)
+                         if slot and (wait or self.frameIds[index] != self.frame))
+        for _, index in pending:
+            if not wait and not self.Ready(self.slots[index]):
+                break
+            self.Read(index)
+
+    def BeginFrame(self):
+        self.frame += 1
+        self.Collect()
+        index = self.frame % len(self.slots)
+        if self.slots[index]:
+            # The GPU is more than `latency` frames behind: drop the oldest frame
+            self.dropped += 1
+            self.Recycle(index)
+        self.frameIds[index] = self.frame
+
+    def Clear(self):
+        self.frames.clear()
+
+    def Names(self):
+        names = []
+        for _, times in self.frames:
+            for name in times:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def Samples(self, name):
+        return np.array([times.get(name, 0.0) for _, times in self.frames], dtype=np.float64)
+
+    def Averages(self):
+        return {name: 1000.0 * float(self.Samples(name).mean()) for name in self.Names()}
+
+    def Summary(self):
+        summary = {}
+        for name in self.Names():
+            samples = 1000.0 * self.Samples(name)
+            summary[name] = {
+                "mean_ms": float(samples.mean()),
+                "p50_ms": float(np.percentile(samples, 50)),
+                "p95_ms": float(np.percentile(samples, 95)),
+                "max_ms": float(samples.max()),
+            }
+        return summary
+
+    def Delete(self):
+        queries = [query for _, query in self.Handles()]
+        if queries:
+            glDeleteQueries(len(queries), queries)
+        self.slots = [[] for _ in self.slots]
+        self.free = []
+        resources.Forget(self)
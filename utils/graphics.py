@@ -1,29 +1,48 @@
  #graphics.py
 import ctypes
+import time
 import numpy as np
 import copy
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram, compileShader
+from utils import shader_cache, runtime
+from utils.resources import manager as resources
 
 class VBO:
-    def __init__(self, data):
+    def __init__(self, data, usage=GL_STATIC_DRAW):
         self.ID = glGenBuffers(1)
+        self.usage = usage
+        self.nbytes = data.nbytes
         glBindBuffer(GL_ARRAY_BUFFER, self.ID)
-        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, usage)
+        resources.Track(self)
     def Use(self):
         glBindBuffer(GL_ARRAY_BUFFER, self.ID)
+    def Update(self, data):
+        # Re-specify the whole store, lets the driver orphan the old one instead of stalling
+        self.nbytes = data.nbytes
+        glBindBuffer(GL_ARRAY_BUFFER, self.ID)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, self.usage)
+    def Handles(self):
+        return [("buffer", self.ID)]
     def Delete(self):
+        resources.Forget(self)
         glDeleteBuffers(1, (self.ID,))
 
 class IBO:
     def __init__(self, indices):
         self.ID = glGenBuffers(1)
         self.count = len(indices)
+        self.nbytes = indices.nbytes
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ID)
         glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        resources.Track(self)
     def Use(self):
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ID)
+    def Handles(self):
+        return [("buffer", self.ID)]
     def Delete(self):
+        resources.Forget(self)
         glDeleteBuffers(1, (self.ID,))
 
 class VAO:
@@ -49,32 +68,200 @@ class VAO:
             
             glEnableVertexAttribArray(1)
             glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, 7 * float_size, ctypes.c_void_p(3 * float_size))
+        elif stride == 9:
+            # Point sprites: position (3 floats), color (4 floats), size (1 float), layer (1 float)
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 9 * float_size, ctypes.c_void_p(0))
+
+            glEnableVertexAttribArray(1)
+            glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, 9 * float_size, ctypes.c_void_p(3 * float_size))
+
+            glEnableVertexAttribArray(2)
+            glVertexAttribPointer(2, 1, GL_FLOAT, GL_FALSE, 9 * float_size, ctypes.c_void_p(7 * float_size))
+
+            glEnableVertexAttribArray(3)
+            glVertexAttribPointer(3, 1, GL_FLOAT, GL_FALSE, 9 * float_size, ctypes.c_void_p(8 * float_size))
         else:
             # Fallback: positions only
             glEnableVertexAttribArray(0)
             glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * float_size, ctypes.c_void_p(0))
+        resources.Track(self)
     def Use(self):
         glBindVertexArray(self.vao)
+    def Handles(self):
+        return [("vertex_array", self.vao)]
     def Delete(self):
+        resources.Forget(self)
         glDeleteVertexArrays(1, (self.vao,))
 
+class Framebuffer:
+    def __init__(self, width, height, depth=True, filter=GL_LINEAR):
+        # Offscreen render target: RGBA8 color texture plus an optional depth/stencil renderbuffer
+        self.width = width
+        self.height = height
+        self.ID = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.ID)
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture, 0)
+
+        # RGBA8 color plus DEPTH24_STENCIL8
+        self.nbytes = width * height * (8 if depth else 4)
+        self.depth = None
+        if depth:
+            self.depth = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            self.Delete()
+            raise RuntimeError(f"Framebuffer incomplete: 0x{int(status):x}")
+        resources.Track(self)
+
+    def Use(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.ID)
+        glViewport(0, 0, self.width, self.height)
+
+    def ReadPixels(self):
+        # Returns an (height, width, 4) uint8 image, top row first
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.ID)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        image = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 4)
+        return image[::-1].copy()
+
+    def Handles(self):
+        handles = [("framebuffer", self.ID), ("texture", self.texture)]
+        if self.depth is not None:
+            handles.append(("renderbuffer", self.depth))
+        return handles
+
+    def Delete(self):
+        resources.Forget(self)
+        glDeleteFramebuffers(1, (self.ID,))
+        glDeleteTextures(1, (self.texture,))
+        if self.depth is not None:
+            glDeleteRenderbuffers(1, (self.depth,))
+
+class ScreenQuad:
+    def __init__(self, shader):
+        # Draws a texture on a screen rectangle with quad_shader. The corners come from
+        # gl_VertexID, core profile still wants some VAO bound.
+        self.shader = shader
+        self.vao = glGenVertexArrays(1)
+        self.shader.Use()
+        self.rectLocation = glGetUniformLocation(self.shader.ID, "rect".encode('utf-8'))
+        self.circularLocation = glGetUniformLocation(self.shader.ID, "circular".encode('utf-8'))
+        glUniform1i(glGetUniformLocation(self.shader.ID, "image".encode('utf-8')), 0)
+        resources.Track(self)
+
+    def Draw(self, texture, x, y, width, height, viewport_width, viewport_height, circular=False, blend=True):
+        # x, y, width, height in pixels from the bottom left corner of the viewport
+        self.shader.Use()
+        glUniform4f(self.rectLocation,
+                    2.0 * x / viewport_width - 1.0, 2.0 * y / viewport_height - 1.0,
+                    2.0 * width / viewport_width, 2.0 * height / viewport_height)
+        glUniform1i(self.circularLocation, 1 if circular else 0)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, texture)
+
+        glDisable(GL_DEPTH_TEST)
+        if blend:
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, 6)
+        if blend:
+            glDisable(GL_BLEND)
+        glEnable(GL_DEPTH_TEST)
+
+    def Handles(self):
+        return [("vertex_array", self.vao)]
+
+    def Delete(self):
+        resources.Forget(self)
+        glDeleteVertexArrays(1, (self.vao,))
+
+# Compile/link (or cache load) time of every program created, in creation order
+shaderTimings = []
+
 class Shader:
-    def __init__(self, vertex_shader, fragment_shader):
-        self.ID = compileProgram(
-            compileShader(vertex_shader, GL_VERTEX_SHADER),
-            compileShader(fragment_shader, GL_FRAGMENT_SHADER)
-        )
+    def __init__(self, vertex_shader, fragment_shader, name="shader"):
+        self.name = name
+        start = time.perf_counter()
+        key = shader_cache.CacheKey(vertex_shader, fragment_shader)
+        self.ID = shader_cache.Load(key)
+        source = "cache"
+        if self.ID is None:
+            source = "compile"
+            self.ID = self.Compile(vertex_shader, fragment_shader)
+            shader_cache.Store(key, self.ID)
+        elapsed_ms = 1000.0 * (time.perf_counter() - start)
+        shaderTimings.append({"name": name, "source": source, "ms": elapsed_ms})
+        runtime.trace.Record("shader compile", elapsed_ms / 1000.0)
+        runtime.Log(f"Shader '{name}' ready from {source} in {elapsed_ms:.2f} ms")
+        resources.Track(self)
         self.Use()
+
+    @staticmethod
+    def Compile(vertex_shader, fragment_shader):
+        # Same as compileProgram, but asks the driver to keep the binary retrievable.
+        # The shader objects are always deleted, and the program too if anything fails.
+        shaders = []
+        program = None
+        linked = False
+        try:
+            for source, shader_type in ((vertex_shader, GL_VERTEX_SHADER), (fragment_shader, GL_FRAGMENT_SHADER)):
+                # compileShader would leak the shader object it fails on
+                shader = glCreateShader(shader_type)
+                shaders.append(shader)
+                glShaderSource(shader, source)
+                glCompileShader(shader)
+                if glGetShaderiv(shader, GL_COMPILE_STATUS) != GL_TRUE:
+                    raise RuntimeError(f"Shader compile failure: {glGetShaderInfoLog(shader)}")
+            program = glCreateProgram()
+            for shader in shaders:
+                glAttachShader(program, shader)
+            if shader_cache.Supported():
+                glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+            glLinkProgram(program)
+            if glGetProgramiv(program, GL_LINK_STATUS) != GL_TRUE:
+                raise RuntimeError(f"Shader link failure: {glGetProgramInfoLog(program)}")
+            linked = True
+            return program
+        finally:
+            for shader in shaders:
+                if program is not None:
+                    glDetachShader(program, shader)
+                glDeleteShader(shader)
+            if program is not None and not linked:
+                glDeleteProgram(program)
+
     def Use(self):
         glUseProgram(self.ID)
+    def Handles(self):
+        return [("program", self.ID)]
     def Delete(self):
+        resources.Forget(self)
         glDeleteProgram(self.ID)
 
 class Camera:
     def __init__(self, height, width):
         self.height = height
         self.width = width
-        self.position = np.array([50, 0, 0], dtype=np.float32)
+        self.position = np.array([50, 0, 0], dtype=np.float64)
+        # Rendering is camera-relative: world positions are stored in float64 and the
+        # origin is moved to the camera every frame before anything is cast to float32.
+        self.origin = np.zeros(3, dtype=np.float64)
         self.lookAt = np.array([0, 0, 0], dtype=np.float32)
         self.up = np.array([0, 0, 0], dtype=np.float32)
         self.near = 1.0
@@ -99,14 +286,19 @@ class Camera:
             [ 0,0,0,1]
         ], dtype=np.float32)
         
+        # Rebase on the camera, the remaining translation is computed in float64
+        self.origin = np.array(self.position, dtype=np.float64)
+        relative = np.asarray(self.position, dtype=np.float64) - self.origin
         viewTranslation = np.array([
-            [1, 0, 0, -self.position[0]],
-            [0, 1, 0, -self.position[1]],
-            [0, 0, 1, -self.position[2]],
+            [1, 0, 0, -relative[0]],
+            [0, 1, 0, -relative[1]],
+            [0, 0, 1, -relative[2]],
             [0, 0, 0, 1]
         ], dtype=np.float32)
         
         viewMatrix = viewRotation @ viewTranslation
+        self.viewRotation = viewRotation
+        self.viewMatrix = viewMatrix
         
         # --- Compute a Standard Perspective Projection Matrix ---
         aspect = self.width / self.height
@@ -120,6 +312,7 @@ class Camera:
             [0, 0, (far + near) / (near - far), (2 * far * near) / (near - far)],
             [0, 0, -1, 0]
         ], dtype=np.float32)
+        self.projectionMatrix = projectionMatrix
         
         viewMatrixLocation = glGetUniformLocation(shader.ID, "viewMatrix".encode('utf-8'))
         glUniformMatrix4fv(viewMatrixLocation, 1, GL_TRUE, viewMatrix)
@@ -127,65 +320,120 @@ class Camera:
         projectionMatrixLocation = glGetUniformLocation(shader.ID, "projectionMatrix".encode('utf-8'))
         glUniformMatrix4fv(projectionMatrixLocation, 1, GL_TRUE, projectionMatrix)
 
-class Object:
-    def __init__(self, objType, shader, properties):
-        self.properties = copy.deepcopy(properties)
-        self.shader = shader
-        
+class Mesh:
+    def __init__(self, properties):
+        # Builds the GPU buffers from the geometry keys and removes them from properties.
+        # A mesh can be shared by any number of Objects.
         # Check if the properties include normals. If so, interleave positions, colors, and normals.
-        if ('normals' in self.properties) and ('positions' in self.properties) and ('colors' in self.properties):
-            positions = self.properties['positions']
-            normals = self.properties['normals']
-            colors = self.properties['colors']
-            num_vertices = len(positions) // 3
-            interleaved = []
-            for i in range(num_vertices):
-                # Add position (3 floats)
-                interleaved.extend(positions[i*3 : (i+1)*3])
-                # Add color (4 floats)
-                interleaved.extend(colors[i*4 : (i+1)*4])
-                # Add normal (3 floats)
-                interleaved.extend(normals[i*3 : (i+1)*3])
-            interleaved = np.array(interleaved, dtype=np.float32)
+        if ('normals' in properties) and ('positions' in properties) and ('colors' in properties):
+            positions = np.asarray(properties['positions'], dtype=np.float32).reshape(-1, 3)
+            colors = np.asarray(properties['colors'], dtype=np.float32).reshape(-1, 4)
+            normals = np.asarray(properties['normals'], dtype=np.float32).reshape(-1, 3)
+            interleaved = np.ascontiguousarray(np.hstack([positions, colors, normals]), dtype=np.float32)
             self.vbo = VBO(interleaved)
             self.vao = VAO(self.vbo, 10)  # 10 floats per vertex
-            self.num_vertices = num_vertices  # Save vertex count for drawing.
+            self.num_vertices = len(positions)  # Save vertex count for drawing.
             # Remove these keys so we don't duplicate data.
-            self.properties.pop('positions')
-            self.properties.pop('normals')
-            self.properties.pop('colors')
-        elif 'colors' in self.properties:
+            properties.pop('positions')
+            properties.pop('normals')
+            properties.pop('colors')
+        elif 'colors' in properties:
             # Legacy: only positions and colors, no normals.
-            vertices = self.properties['vertices']
-            colors = self.properties['colors']
-            num_vertices = len(vertices) // 3
-            interleaved = []
-            for i in range(num_vertices):
-                interleaved.extend(vertices[i*3:(i+1)*3])
-                interleaved.extend(colors[i*4:(i+1)*4])
-            interleaved = np.array(interleaved, dtype=np.float32)
+            vertices = np.asarray(properties['vertices'], dtype=np.float32).reshape(-1, 3)
+            colors = np.asarray(properties['colors'], dtype=np.float32).reshape(-1, 4)
+            interleaved = np.ascontiguousarray(np.hstack([vertices, colors]), dtype=np.float32)
             self.vbo = VBO(interleaved)
             self.vao = VAO(self.vbo, 7)
-            self.num_vertices = num_vertices
-            self.properties.pop('vertices')
-            self.properties.pop('colors')
+            self.num_vertices = len(vertices)
+            properties.pop('vertices')
+            properties.pop('colors')
         else:
             # Fallback: positions only.
-            self.vbo = VBO(self.properties['vertices'])
+            self.vbo = VBO(properties['vertices'])
             self.vao = VAO(self.vbo, 3)
-            self.num_vertices = len(self.properties['vertices']) // 3
-            self.properties.pop('vertices')
+            self.num_vertices = len(properties['vertices']) // 3
+            properties.pop('vertices')
             
         # Assume indices are provided if using glDrawElements.
-        if 'indices' in self.properties:
-            self.ibo = IBO(self.properties['indices'])
-            self.properties.pop('indices')
+        if 'indices' in properties:
+            self.ibo = IBO(properties['indices'])
+            properties.pop('indices')
         else:
             self.ibo = None
-        # Store shader reference in self.shader
+        self.bvh = None  # collision tree, set by the owner for collidable meshes
+        self.stats = {}  # vertex cache optimization results, see utils/meshopt.py
+
+    def GPUBytes(self):
+        return self.vbo.nbytes + (self.ibo.nbytes if self.ibo is not None else 0)
+
+    def Parts(self):
+        return [part for part in (self.vao, self.vbo, self.ibo) if part is not None]
+
+    # Every Object drawing the mesh holds a reference, the creator holds the first one
+    def Retain(self):
+        for part in self.Parts():
+            resources.Retain(part)
+
+    def Release(self):
+        for part in self.Parts():
+            resources.Release(part)
+
+    def References(self):
+        return resources.References(self.vbo)
 
     def Draw(self):
-        position = self.properties['position']
+        self.vao.Use()
+        
+        if self.ibo is not None:
+            self.ibo.Use()
+            glDrawElements(GL_TRIANGLES, self.ibo.count, GL_UNSIGNED_INT, None)
+        else:
+            # If no indices, use glDrawArrays with the stored vertex count.
+            glDrawArrays(GL_TRIANGLES, 0, self.num_vertices)
+
+    def Delete(self):
+        self.vao.Delete()
+        self.vbo.Delete()
+        if self.ibo is not None:
+            self.ibo.Delete()
+
+class Object:
+    def __init__(self, objType, shader, properties):
+        self.shader = shader
+        if 'mesh' in properties:
+            # Shared mesh: only the per-entity state is copied
+            self.mesh = properties['mesh']
+            self.properties = copy.deepcopy({key: value for key, value in properties.items() if key != 'mesh'})
+        else:
+            self.properties = copy.deepcopy(properties)
+            self.mesh = Mesh(self.properties)
+        self.holdsMesh = False  # whether this entity holds a reference on its (shared) mesh
+
+    def RetainMesh(self):
+        if not self.holdsMesh:
+            self.mesh.Retain()
+            self.holdsMesh = True
+
+    def ReleaseMesh(self):
+        # At most one reference per entity, releasing twice is a no-op
+        if not self.holdsMesh:
+            runtime.Log("Object.ReleaseMesh: mesh already released, ignored")
+            return
+        self.holdsMesh = False
+        self.mesh.Release()
+
+    def Reset(self, mesh, properties):
+        # Reuse a pooled object for a new entity
+        if self.holdsMesh:
+            self.ReleaseMesh()
+        self.mesh = mesh
+        self.properties = copy.deepcopy({key: value for key, value in properties.items() if key != 'mesh'})
+
+    def Draw(self, origin=None):
+        # Subtract the floating origin in float64 before the model matrix drops to float32
+        position = np.asarray(self.properties['position'], dtype=np.float64)
+        if origin is not None:
+            position = position - origin
         scale = self.properties['scale']
         # Use local orientation if available.
         if "orientation" in self.properties:
@@ -239,13 +487,13 @@ class Object:
         colorLocation = glGetUniformLocation(self.shader.ID, "objectColor".encode('utf-8'))
         c = self.properties.get("color", [1, 1, 1, 1])
         glUniform4f(colorLocation, c[0], c[1], c[2], c[3])
-        
-        self.vao.Use()
-        
-        if self.ibo is not None:
-            self.ibo.Use()
-            glDrawElements(GL_TRIANGLES, self.ibo.count, GL_UNSIGNED_INT, None)
-        else:
-            # If no indices, use glDrawArrays with the stored vertex count.
-            glDrawArrays(GL_TRIANGLES, 0, self.num_vertices)
 
+        # Meshes shared across color variants get their two-color gradient from uniforms
+        palette = self.properties.get("palette")
+        glUniform1i(glGetUniformLocation(self.shader.ID, "usePalette".encode('utf-8')), 0 if palette is None else 1)
+        if palette is not None:
+            bottom, top = palette
+            glUniform3f(glGetUniformLocation(self.shader.ID, "paletteBottom".encode('utf-8')), *bottom)
+            glUniform3f(glGetUniformLocation(self.shader.ID, "paletteTop".encode('utf-8')), *top)
+        
+        self.mesh.Draw()
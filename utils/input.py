@@ -0,0 +1,95 @@
+#input.py
+from collections import deque
+
+# Event driven keyboard and mouse input. GLFW callbacks update a bitmask of held buttons and
+# queue timestamped events; once per frame Frame() hands out the state plus the buttons
+# pressed and released since the previous frame. Nothing is polled, and a click shorter
+# than a frame still shows up as held for one frame.
+
+# Bit order of the button masks (also used by input logs, see utils/replay.py)
+BINDINGS = (
+    ("1", "KEY_1"), ("W", "KEY_W"), ("S", "KEY_S"), ("A", "KEY_A"), ("D", "KEY_D"),
+    ("Q", "KEY_Q"), ("E", "KEY_E"), ("SPACE", "KEY_SPACE"), ("L_SHIFT", "KEY_LEFT_SHIFT"),
+    ("R_CLICK", "MOUSE_BUTTON_RIGHT"), ("L_CLICK", "MOUSE_BUTTON_LEFT"), ("V", "KEY_V"), ("F3", "KEY_F3"),
+)
+INPUT_KEYS = tuple(name for name, _ in BINDINGS)
+BITS = {name: 1 << bit for bit, name in enumerate(INPUT_KEYS)}
+
+def PackButtons(inputs, keys=INPUT_KEYS):
+    mask = 0
+    for bit, key in enumerate(keys):
+        if inputs.get(key, False):
+            mask |= 1 << bit
+    return mask
+
+def UnpackButtons(mask, keys=INPUT_KEYS):
+    return {key: bool(mask >> bit & 1) for bit, key in enumerate(keys)}
+
+def Pressed(inputs, key):
+    return bool(inputs["pressed"] & BITS[key])
+
+def Released(inputs, key):
+    return bool(inputs["released"] & BITS[key])
+
+class EdgeDetector:
+    # Fills in "pressed" / "released" for inputs that do not come from Input (scripted
+    # benchmark scenes, replays) by comparing the held buttons with the previous frame
+    def __init__(self):
+        self.previous = 0
+
+    def Update(self, inputs):
+        held = PackButtons(inputs)
+        if "pressed" not in inputs:
+            inputs["pressed"] = held & ~self.previous
+            inputs["released"] = self.previous & ~held
+        self.previous = held
+        return inputs
+
+class Input:
+    def __init__(self, glfw, window, history=256):
+        self.glfw = glfw
+        self.keys = {}
+        self.buttons = {}
+        for bit, (name, code) in enumerate(BINDINGS):
+            table = self.buttons if code.startswith("MOUSE_") else self.keys
+            table[getattr(glfw, code)] = 1 << bit
+        self.down = 0
+        self.pressed = 0
+        self.released = 0
+        self.cursor = glfw.get_cursor_pos(window)
+        self.events = deque(maxlen=history)  # (time, button name, glfw action)
+
+    def Button(self, bit, action):
+        # GLFW_REPEAT is ignored, held state already covers it
+        if action == self.glfw.PRESS:
+            self.down |= bit
+            self.pressed |= bit
+        elif action == self.glfw.RELEASE:
+            self.down &= ~bit
+            self.released |= bit
+        else:
+            return
+        self.events.append((self.glfw.get_time(), INPUT_KEYS[bit.bit_length() - 1], action))
+
+    def OnKey(self, window, key, scancode, action, mods):
+        bit = self.keys.get(key)
+        if bit is not None:
+            self.Button(bit, action)
+
+    def OnMouseButton(self, window, button, action, mods):
+        bit = self.buttons.get(button)
+        if bit is not None:
+            self.Button(bit, action)
+
+    def OnCursor(self, window, x, y):
+        self.cursor = (x, y)
+
+    def Frame(self):
+        # Held buttons (including those pressed and released within the frame), the edges
+        # since the last call and the events queued since then, oldest first
+        held = self.down | self.pressed
+        pressed, released = self.pressed, self.released
+        self.pressed = self.released = 0
+        events = list(self.events)
+        self.events.clear()
+        return held, pressed, released, events
@@ -0,0 +1,69 @@
+#jobs.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Small job scheduler for the per-frame update systems. Every job names the state it reads
+# and writes; jobs that do not conflict with an earlier job of the same Run() are started
+# together on a persistent thread pool, conflicting ones wait for the wave they depend on.
+# Run() returns once every job has finished, so the caller can rely on all writes.
+#
+# numpy releases the GIL in its heavier kernels, that is where the overlap comes from.
+
+class Job:
+    def __init__(self, name, function, reads=(), writes=()):
+        self.name = name
+        self.function = function
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+
+    def ConflictsWith(self, other):
+        return bool(self.writes & (other.reads | other.writes) or other.writes & self.reads)
+
+def Waves(jobs):
+    # Groups jobs into waves that can run concurrently, keeping the order of dependent jobs
+    waves = []
+    levels = []
+    for index, job in enumerate(jobs):
+        level = 1 + max((levels[i] for i in range(index) if job.ConflictsWith(jobs[i])), default=-1)
+        levels.append(level)
+        if level == len(waves):
+            waves.append([])
+        waves[level].append(job)
+    return waves
+
+class JobSystem:
+    def __init__(self, workers=None, profiler=None):
+        # workers: pool size, None picks one per core (at most 4); 0 or 1 runs jobs inline
+        if workers is None:
+            workers = min(4, os.cpu_count() or 1)
+        self.workers = workers
+        self.profiler = profiler
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="job") if workers > 1 else None
+
+    def Run(self, jobs):
+        timings = {}
+        def timed(job):
+            start = time.perf_counter()
+            result = job.function()
+            timings[job.name] = time.perf_counter() - start
+            return result
+        results = {}
+        for wave in Waves(jobs):
+            if self.pool is None or len(wave) == 1:
+                for job in wave:
+                    results[job.name] = timed(job)
+            else:
+                futures = [(job.name, self.pool.submit(timed, job)) for job in wave]
+                for name, future in futures:
+                    results[name] = future.result()
+        # Recorded from this thread only, the profiler is not thread safe
+        if self.profiler is not None and self.profiler.enabled:
+            for name, seconds in timings.items():
+                self.profiler.Record(name, seconds)
+        return results
+
+    def Shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
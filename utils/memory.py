@@ -0,0 +1,66 @@
+#memory.py
+import sys
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+
+# Memory accounting helpers. Host sizes are estimates: numpy arrays count their data
+# buffer, containers count themselves plus their contents, shared objects are counted once.
+
+def HostBytes(value, seen=None):
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        # numpy includes the data buffer only for arrays that own it, views cost their header
+        return sys.getsizeof(value)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(HostBytes(key, seen) + HostBytes(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(HostBytes(item, seen) for item in value)
+    return size
+
+def FormatBytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GiB"
+
+class MemoryTracer:
+    def __init__(self, enabled=True, top=10):
+        # Traces host allocations of selected phases (e.g. InitScene) with tracemalloc.
+        # Tracing slows every allocation down, so it only runs inside Trace().
+        self.enabled = enabled
+        self.top = top
+        self.traces = {}
+
+    @contextmanager
+    def Trace(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            top = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")[:self.top]
+            self.traces[name] = {
+                "peak_bytes": peak - base,
+                "retained_bytes": current - base,
+                "top": [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                         "size_bytes": stat.size_diff, "count": stat.count_diff} for stat in top],
+            }
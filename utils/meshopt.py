@@ -0,0 +1,204 @@
+#meshopt.py
+import hashlib
+import io
+import json
+import os
+import numpy as np
+
+# Mesh optimization for the post-transform vertex cache. The OBJ loaders emit triangle
+# soups (three unique vertices per triangle), so every vertex is transformed three times
+# over. Optimize() welds identical vertices into an indexed mesh, orders the triangles
+# for the vertex cache (Tom Forsyth, "Linear-Speed Vertex Cache Optimisation") and then
+# renumbers the vertices in first-use order so fetches walk the vertex buffer forwards.
+#
+# The result is cached on disk keyed by the input arrays, like the shader binaries, with
+# the ACMR (average cache misses per triangle, 3.0 = no reuse) before and after.
+
+PIPELINE_VERSION = 1
+CACHE_DIR = os.environ.get("SPACE_HEIST_MESH_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "space_heist", "meshes"))
+enabled = os.environ.get("SPACE_HEIST_MESH_CACHE_DISABLE", "") == ""
+
+def Weld(*attributes):
+    # attributes: per-vertex float32 arrays (n, k). Returns (unique rows per attribute, indices)
+    rows = np.ascontiguousarray(np.hstack([np.asarray(a, dtype=np.float32).reshape(len(a), -1) for a in attributes]))
+    keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # Keep the vertices in order of first appearance
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    unique = rows[first[order]]
+    split = np.cumsum([np.asarray(a).reshape(len(a), -1).shape[1] for a in attributes])[:-1]
+    return np.split(unique, split, axis=1), rank[inverse.ravel()].astype(np.uint32)
+
+def ACMR(indices, cache_size=16):
+    # Misses of a FIFO cache of `cache_size` vertices per triangle
+    cache = []
+    cached = set()
+    misses = 0
+    for index in indices.tolist():
+        if index in cached:
+            continue
+        misses += 1
+        cache.append(index)
+        cached.add(index)
+        if len(cache) > cache_size:
+            cached.discard(cache.pop(0))
+    return misses / max(1, len(indices) // 3)
+
+# Forsyth's scoring constants
+CACHE_SIZE = 32
+CACHE_DECAY_POWER = 1.5
+LAST_TRI_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+
+def VertexScores(cache_size=CACHE_SIZE, max_valence=64):
+    # Tables: position score by cache position (-1 = not cached, last entry) and valence boost
+    positions = np.zeros(cache_size + 1)
+    positions[:3] = LAST_TRI_SCORE
+    positions[3:cache_size] = (1.0 - (np.arange(3, cache_size) - 3) / (cache_size - 3)) ** CACHE_DECAY_POWER
+    valence = np.zeros(max_valence + 1)
+    valence[1:] = VALENCE_BOOST_SCALE * np.arange(1, max_valence + 1, dtype=np.float64) ** -VALENCE_BOOST_POWER
+    return positions.tolist(), valence.tolist()
+
+def ForsythOrder(indices, vertex_count, cache_size=CACHE_SIZE):
+    # Returns the triangles reordered for a LRU cache of `cache_size` entries
+    triangles = indices.reshape(-1, 3).tolist()
+    count = len(triangles)
+    position_score, valence_score = VertexScores(cache_size)
+    max_valence = len(valence_score) - 1
+    adjacency = [[] for _ in range(vertex_count)]
+    for t, (a, b, c) in enumerate(triangles):
+        adjacency[a].append(t)
+        adjacency[b].append(t)
+        adjacency[c].append(t)
+    cache_position = [-1] * vertex_count
+    def score(v):
+        remaining = len(adjacency[v])
+        if remaining == 0:
+            return -1.0
+        return position_score[cache_position[v]] + valence_score[min(remaining, max_valence)]
+    vertex_score = [score(v) for v in range(vertex_count)]
+    triangle_score = [vertex_score[a] + vertex_score[b] + vertex_score[c] for a, b, c in triangles]
+    emitted = [False] * count
+    order = []
+    cache = []
+    best = max(range(count), key=triangle_score.__getitem__) if count else -1
+    cursor = 0
+    while len(order) < count:
+        if best < 0:
+            # Nothing adjacent to the cache is left: continue with the next unused triangle
+            while emitted[cursor]:
+                cursor += 1
+            best = cursor
+        emitted[best] = True
+        order.append(best)
+        tri = triangles[best]
+        for v in tri:
+            adjacency[v].remove(best)
+        # Most recently used first, evicted vertices fall off the end
+        cache = tri + [v for v in cache if v not in tri]
+        for v in cache[cache_size:]:
+            cache_position[v] = -1
+        touched = cache
+        cache = cache[:cache_size]
+        for position, v in enumerate(cache):
+            cache_position[v] = position
+        best, best_score = -1, -1.0
+        for v in touched:
+            new_score = score(v)
+            delta = new_score - vertex_score[v]
+            vertex_score[v] = new_score
+            for t in adjacency[v]:
+                triangle_score[t] += delta
+        for v in cache:
+            for t in adjacency[v]:
+                if triangle_score[t] > best_score:
+                    best, best_score = t, triangle_score[t]
+    return np.asarray(triangles, dtype=np.uint32)[order].ravel()
+
+def FetchOrder(indices, vertex_count):
+    # New vertex numbers in order of first use; returns (remap old -> new, new indices)
+    remap = np.full(vertex_count, -1, dtype=np.int64)
+    _, first = np.unique(indices, return_index=True)
+    used = indices[np.sort(first)]
+    remap[used] = np.arange(len(used))
+    return remap, remap[indices].astype(np.uint32)
+
+def CacheKey(name, *arrays):
+    digest = hashlib.sha256(f"{name}:{PIPELINE_VERSION}".encode())
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def CachePath(key):
+    return os.path.join(CACHE_DIR, key + ".npz")
+
+def Load(key):
+    if not enabled:
+        return None
+    try:
+        with np.load(CachePath(key)) as data:
+            result = {name: data[name] for name in data.files if name != "stats"}
+            result["stats"] = json.loads(str(data["stats"]))
+        return result
+    except Exception:
+        return None
+
+def Store(key, result):
+    if not enabled:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        buffer = io.BytesIO()
+        arrays = {name: value for name, value in result.items() if name != "stats"}
+        np.savez(buffer, stats=json.dumps(result["stats"]), **arrays)
+        # Write then rename so a crash never leaves a truncated file behind
+        path = CachePath(key)
+        with open(path + ".tmp", "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(path + ".tmp", path)
+    except Exception:
+        pass
+
+def Optimize(name, positions, normals, colors):
+    # Triangle soup in, indexed and cache optimized mesh out (same keys plus 'indices' and
+    # 'stats'), loaded from the mesh cache when the same input was optimized before.
+    # Meshes without shared vertices stay unindexed.
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)
+    colors = np.asarray(colors, dtype=np.float32).reshape(-1, 4)
+    key = CacheKey(name, positions, normals, colors)
+    cached = Load(key)
+    if cached is not None:
+        return cached
+    (welded_positions, welded_normals, welded_colors), indices = Weld(positions, normals, colors)
+    vertex_count = len(welded_positions)
+    if vertex_count == len(positions):
+        # Nothing shared (e.g. flat shaded: one normal per face), indices would only cost memory
+        result = {"positions": positions.ravel(), "normals": normals.ravel(), "colors": colors.ravel(),
+                  "stats": {"soup_vertices": len(positions), "vertices": vertex_count,
+                            "triangles": vertex_count // 3, "acmr_before": 3.0, "acmr_after": 3.0}}
+        Store(key, result)
+        return result
+    before = ACMR(indices)
+    indices = ForsythOrder(indices, vertex_count)
+    remap, indices = FetchOrder(indices, vertex_count)
+    order = np.argsort(remap)[np.sort(remap) >= 0]
+    result = {
+        "positions": welded_positions[order].ravel(),
+        "normals": welded_normals[order].ravel(),
+        "colors": welded_colors[order].ravel(),
+        "indices": indices,
+        "stats": {
+            "soup_vertices": len(positions),
+            "vertices": len(order),
+            "triangles": len(indices) // 3,
+            "acmr_before": before,
+            "acmr_after": ACMR(indices),
+        },
+    }
+    Store(key, result)
+    return result
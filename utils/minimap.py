@@ -0,0 +1,132 @@
+#minimap.py
+import numpy as np
+from OpenGL.GL import *
+from utils.graphics import VBO, VAO, Framebuffer
+
+# Radar minimap. The blips are rendered into a small texture only when the cache goes
+# stale (refresh_rate) or the transporter has moved far enough (move_threshold); every
+# frame only composites that texture as a single quad.
+
+BLIP_STYLES = {
+    # group: (color, point size)
+    "planets": ((0.4, 0.6, 1.0, 1.0), 7.0),
+    "stations": ((0.8, 0.2, 1.0, 1.0), 4.0),
+    "pirates": ((1.0, 0.2, 0.2, 1.0), 4.0),
+}
+DESTINATION_STYLE = ((0.0, 1.0, 0.0, 1.0), 9.0)
+TRANSPORTER_STYLE = ((1.0, 1.0, 1.0, 1.0), 6.0)
+
+class Minimap:
+    def __init__(self, shader, quad, size=256, map_range=3000.0, refresh_rate=5.0, move_threshold=100.0):
+        self.shader = shader
+        self.quad = quad
+        self.size = size
+        self.map_range = map_range            # world units from the center to the edge
+        self.refresh_rate = refresh_rate      # texture updates per second
+        self.move_threshold = move_threshold  # distance moved that forces an early update
+        self.target = Framebuffer(size, size, depth=False)
+        self.vbo = VBO(np.zeros((1, 9), dtype=np.float32), GL_DYNAMIC_DRAW)
+        self.vao = VAO(self.vbo, 9)
+        self.num_blips = 0
+        self.lastRefresh = None
+        self.lastPosition = None
+        self.refreshes = 0
+
+        # Orthographic projection of the map plane, the texture is square
+        r = self.map_range
+        self.projectionMatrix = np.array([
+            [1.0 / r, 0, 0, 0],
+            [0, 1.0 / r, 0, 0],
+            [0, 0, -1, 0],
+            [0, 0, 0, 1]
+        ], dtype=np.float32)
+        self.shader.Use()
+        self.projectionMatrixLocation = glGetUniformLocation(self.shader.ID, "projectionMatrix".encode('utf-8'))
+
+    def NeedsRefresh(self, now, position):
+        if self.lastRefresh is None:
+            return True
+        if now - self.lastRefresh >= 1.0 / self.refresh_rate:
+            return True
+        return np.linalg.norm(position - self.lastPosition) > self.move_threshold
+
+    def Blips(self, center, positions, style, clamp=False):
+        # (n, 9) rows of map position, color, size, unused layer for a group of world positions
+        if len(positions) == 0:
+            return np.zeros((0, 9))
+        offsets = np.asarray(positions, dtype=np.float64) - center
+        # North up: world +x to the right, world -z up, matching the HUD arrow
+        plane = np.stack([offsets[:, 0], -offsets[:, 2]], axis=1)
+        if clamp:
+            # Keep far targets on the rim instead of dropping them
+            distance = np.linalg.norm(plane, axis=1, keepdims=True)
+            limit = 0.95 * self.map_range
+            plane = np.where(distance > limit, plane * limit / np.maximum(distance, 1e-9), plane)
+        else:
+            inside = np.linalg.norm(plane, axis=1) <= self.map_range
+            plane = plane[inside]
+            offsets = offsets[inside]
+        color, size = style
+        blips = np.zeros((len(plane), 9))
+        blips[:, 0:2] = plane
+        blips[:, 3:7] = color
+        # Bodies far above or below fade out
+        blips[:, 6] = color[3] * (1.0 - 0.6 * np.clip(np.abs(offsets[:, 1]) / self.map_range, 0.0, 1.0))
+        blips[:, 7] = size
+        return blips
+
+    def Collect(self, objects, destination, center):
+        chunks = []
+        for group, style in BLIP_STYLES.items():
+            positions = [obj.properties["position"] for obj in objects.get(group, []) if obj is not destination]
+            chunks.append(self.Blips(center, np.reshape(positions, (-1, 3)), style))
+        if destination is not None:
+            chunks.append(self.Blips(center, [destination.properties["position"]], DESTINATION_STYLE, clamp=True))
+        chunks.append(self.Blips(center, [center], TRANSPORTER_STYLE))
+        return np.ascontiguousarray(np.vstack(chunks), dtype=np.float32)
+
+    def Render(self, blips):
+        previous_framebuffer = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        previous_viewport = glGetIntegerv(GL_VIEWPORT)
+
+        self.target.Use()
+        glClearColor(0.02, 0.05, 0.1, 0.65)
+        glClear(GL_COLOR_BUFFER_BIT)
+
+        self.num_blips = len(blips)
+        if self.num_blips:
+            self.vbo.Update(blips)
+            self.shader.Use()
+            glUniformMatrix4fv(self.projectionMatrixLocation, 1, GL_TRUE, self.projectionMatrix)
+            glDisable(GL_DEPTH_TEST)
+            glEnable(GL_PROGRAM_POINT_SIZE)
+            self.vao.Use()
+            glDrawArrays(GL_POINTS, 0, self.num_blips)
+            glDisable(GL_PROGRAM_POINT_SIZE)
+            glEnable(GL_DEPTH_TEST)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, previous_framebuffer)
+        glViewport(*previous_viewport)
+        self.refreshes += 1
+
+    def Update(self, objects, destination, center, now):
+        center = np.asarray(center, dtype=np.float64)
+        if not self.NeedsRefresh(now, center):
+            return False
+        self.Render(self.Collect(objects, destination, center))
+        self.lastRefresh = now
+        self.lastPosition = center.copy()
+        return True
+
+    def Invalidate(self):
+        self.lastRefresh = None
+
+    def Draw(self, viewport_width, viewport_height, margin=20):
+        # Bottom left corner
+        self.quad.Draw(self.target.texture, margin, margin, self.size, self.size,
+                       viewport_width, viewport_height, circular=True)
+
+    def Delete(self):
+        self.target.Delete()
+        self.vao.Delete()
+        self.vbo.Delete()
@@ -0,0 +1,157 @@
+#occlusion.py
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from utils.graphics import VBO, VAO
+from utils.collision import Orientation
+from utils.resources import manager as resources
+
+# Occlusion culling with GL_ANY_SAMPLES_PASSED queries. Once the occluders (planets) are in
+# the depth buffer, Test() draws the bounding box of every candidate with color and depth
+# writes off, one query each. The results are only read when the GPU reports them available,
+# usually a frame later, so an object is drawn or skipped by its last finished query and the
+# CPU never waits. Objects without a result yet, or with the camera inside their bounding
+# sphere (their box would be clipped away), are always drawn.
+#
+# Boxes outside the view frustum are rejected on the CPU first and never queried, so the
+# hidden counts only hold real occlusion. Such objects count as visible again, an object
+# entering the view is drawn on its first frame; one coming out from behind a planet still
+# appears a frame late, when its query reports it.
+
+def UnitCube():
+    # 12 triangles over the corners of [0, 1]^3
+    corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float32)
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    indices = [i for a, b, c, d in faces for i in (a, b, c, a, c, d)]
+    return np.ascontiguousarray(corners[indices])
+
+CORNERS = np.vstack([np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64).T,
+                     np.ones(8)])  # homogeneous unit cube corners, one per column
+
+class OcclusionCuller:
+    def __init__(self, shader):
+        self.shader = shader
+        self.vbo = VBO(UnitCube())
+        self.vao = VAO(self.vbo, 3)
+        self.shader.Use()
+        self.boxMatrixLocation = glGetUniformLocation(self.shader.ID, "boxMatrix".encode('utf-8'))
+        self.states = {}  # object -> [query, pending, visible]
+        self.free = []
+        self.enabled = True
+        self.stats = {}  # group -> (tested, off screen, occluded) of the last frame
+        self.last = None  # last query issued, queries finish in order
+        self.result = ctypes.c_uint(0)
+        resources.Track(self)
+
+    def Handles(self):
+        return [("query", state[0]) for state in self.states.values()] + [("query", query) for query in self.free]
+
+    def Query(self):
+        if not self.free:
+            self.free.extend(int(query) for query in np.atleast_1d(glGenQueries(16)))
+        return self.free.pop()
+
+    def Forget(self, obj):
+        # Released objects give their query back (pooled objects come back as new entities)
+        state = self.states.pop(obj, None)
+        if state is not None:
+            self.free.append(state[0])
+
+    def Resolve(self):
+        # Reads every pending result once the last query of the previous batch is done
+        if self.last is None:
+            return
+        glGetQueryObjectuiv(self.last, GL_QUERY_RESULT_AVAILABLE, ctypes.byref(self.result))
+        if not self.result.value:
+            return
+        for state in self.states.values():
+            if state[1]:
+                glGetQueryObjectuiv(state[0], GL_QUERY_RESULT, ctypes.byref(self.result))
+                state[1] = False
+                state[2] = bool(self.result.value)
+        self.last = None
+
+    def BoxMatrix(self, obj, origin):
+        # Model matrix times the unit cube -> bounding box transform
+        properties = obj.properties
+        bvh = obj.mesh.bvh
+        scale = np.asarray(properties["scale"], dtype=np.float64)
+        rotation = Orientation(properties)
+        matrix = np.eye(4)
+        matrix[:3, :3] = rotation * (scale * (bvh.nodeMax[0] - bvh.nodeMin[0]))
+        matrix[:3, 3] = np.asarray(properties["position"], dtype=np.float64) - origin + rotation @ (scale * bvh.nodeMin[0])
+        return matrix
+
+    @staticmethod
+    def OffScreen(clip_matrix):
+        # All eight box corners outside the same clip plane
+        corners = clip_matrix @ CORNERS
+        x, y, z, w = corners
+        return bool((x < -w).all() or (x > w).all() or (y < -w).all() or (y > w).all()
+                    or (z < -w).all() or (z > w).all())
+
+    def Test(self, groups, camera):
+        # groups: {name: objects}. Returns the objects of every group to draw this frame and
+        # queries them for the next ones. Call with the occluders already drawn.
+        if not self.enabled:
+            return groups
+        self.Resolve()
+        origin = camera.origin
+        view_projection = np.asarray(camera.projectionMatrix, dtype=np.float64) @ np.asarray(camera.viewMatrix, dtype=np.float64)
+        draw = {}
+        queried = []
+        for group, objects in groups.items():
+            visible = draw[group] = []
+            offscreen = 0
+            for obj in objects:
+                state = self.states.get(obj)
+                bvh = obj.mesh.bvh
+                scale = float(np.max(obj.properties["scale"]))
+                reach = scale * (bvh.radius + float(np.linalg.norm(bvh.center))) + 2.0 * camera.near
+                if np.linalg.norm(np.asarray(obj.properties["position"], dtype=np.float64) - origin) <= reach:
+                    # The camera may be inside the box
+                    visible.append(obj)
+                    continue
+                if state is None:
+                    state = self.states[obj] = [self.Query(), False, True]
+                box = self.BoxMatrix(obj, origin)
+                if self.OffScreen(view_projection @ box):
+                    # Nothing to draw or query; a result still in flight is stale by the
+                    # time the object is back, so it starts out visible
+                    offscreen += 1
+                    state[1] = False
+                    state[2] = True
+                    continue
+                if state[2]:
+                    visible.append(obj)
+                if not state[1]:
+                    queried.append((box, state))
+            self.stats[group] = (len(objects), offscreen, len(objects) - offscreen - len(visible))
+        if not queried:
+            return draw
+
+        camera.Update(self.shader)
+        self.vao.Use()
+        glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
+        glDepthMask(GL_FALSE)
+        for box, state in queried:
+            glUniformMatrix4fv(self.boxMatrixLocation, 1, GL_TRUE, box.astype(np.float32))
+            glBeginQuery(GL_ANY_SAMPLES_PASSED, state[0])
+            glDrawArrays(GL_TRIANGLES, 0, 36)
+            glEndQuery(GL_ANY_SAMPLES_PASSED)
+            state[1] = True
+        self.last = queried[-1][1][0]
+        glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
+        glDepthMask(GL_TRUE)
+        return draw
+
+    def Delete(self):
+        queries = [query for _, query in self.Handles()]
+        if queries:
+            glDeleteQueries(len(queries), queries)
+        self.states = {}
+        self.free = []
+        self.last = None
+        self.vao.Delete()
+        self.vbo.Delete()
+        resources.Forget(self)
@@ -0,0 +1,95 @@
+#offscreen.py
+import os
+import ctypes
+
+# Display-less GL contexts for benchmarks and CI hosts.
+# PyOpenGL picks its platform on first import, so SelectPlatform must run before
+# anything imports OpenGL (including utils.graphics and game).
+
+BACKENDS = ("egl", "osmesa")
+
+def SelectPlatform(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown offscreen backend '{backend}', expected one of {BACKENDS}")
+    os.environ["PYOPENGL_PLATFORM"] = backend
+    if backend == "egl":
+        # Mesa: no window system at all
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+        # PyOpenGL's EGL wrappers fail to import once OpenGL.ERROR_CHECKING is off,
+        # so load them now, before a runtime profile gets a chance to turn it off
+        from OpenGL import EGL
+
+class OffscreenContext:
+    def __init__(self, backend, width, height):
+        # Creates a 3.3 core context and makes it current. Rendering must go to an FBO,
+        # neither backend gives us a usable default framebuffer.
+        self.backend = backend
+        self.width = width
+        self.height = height
+        if backend == "egl":
+            self._CreateEGL()
+        elif backend == "osmesa":
+            self._CreateOSMesa()
+        else:
+            raise ValueError(f"Unknown offscreen backend '{backend}', expected one of {BACKENDS}")
+
+        from OpenGL.GL import glGetString, GL_RENDERER, GL_VERSION
+        self.renderer = glGetString(GL_RENDERER).decode()
+        self.version = glGetString(GL_VERSION).decode()
+
+    def _CreateEGL(self):
+        from OpenGL import EGL
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self.display, None, None):
+            raise RuntimeError("eglInitialize failed")
+
+        config = EGL.EGLConfig()
+        n_configs = EGL.EGLint()
+        config_attribs = (EGL.EGLint * 5)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE)
+        EGL.eglChooseConfig(self.display, config_attribs, ctypes.pointer(config), 1, ctypes.pointer(n_configs))
+        if n_configs.value == 0:
+            raise RuntimeError("No EGL config with desktop OpenGL support")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attribs = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+        if not self.context:
+            raise RuntimeError("eglCreateContext failed")
+        # Surfaceless: EGL_KHR_surfaceless_context lets us skip the pbuffer entirely
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("eglMakeCurrent failed")
+
+    def _CreateOSMesa(self):
+        from OpenGL import osmesa, arrays
+        from OpenGL.GL import GL_UNSIGNED_BYTE
+        attribs = arrays.GLintArray.asArray([
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+            0])
+        self.context = osmesa.OSMesaCreateContextAttribs(attribs, None)
+        if not self.context:
+            raise RuntimeError("OSMesaCreateContextAttribs failed")
+        # OSMesa wants a client-side color buffer even though we render to an FBO
+        self.buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+            raise RuntimeError("OSMesaMakeCurrent failed")
+
+    def Delete(self):
+        if self.backend == "egl":
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
@@ -0,0 +1,73 @@
+#orbits.py
+import numpy as np
+
+# Station orbits in closed form: angle(t) = phase + speed * t around a fixed center, in the
+# x-y plane of the planet. Nothing is integrated, so there is no drift and a station can be
+# placed for any simulation time without having been updated before.
+
+def OrbitAngles(phases, speeds, t):
+    return np.asarray(phases, dtype=np.float64) + np.asarray(speeds, dtype=np.float64) * t
+
+def OrbitPositions(centers, radii, angles):
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=np.float64)
+    offsets = np.zeros_like(centers)
+    offsets[:, 0] = radii * np.cos(angles)
+    offsets[:, 1] = radii * np.sin(angles)
+    return centers + offsets
+
+class Orbits:
+    def __init__(self, body_radius=35.0):
+        # body_radius: bounding radius of an orbiting body, used by the visibility test
+        self.body_radius = body_radius
+        self.bodies = []
+        self.dirty = True
+
+    def Invalidate(self):
+        # Call when bodies are added or removed
+        self.dirty = True
+
+    def Rebuild(self, bodies):
+        self.bodies = list(bodies)
+        self.centers = np.array([body.properties["orbitCenter"] for body in self.bodies], dtype=np.float64).reshape(-1, 3)
+        self.radii = np.array([body.properties["orbitRadius"] for body in self.bodies], dtype=np.float64)
+        self.phases = np.array([body.properties["orbitPhase"] for body in self.bodies], dtype=np.float64)
+        self.speeds = np.array([body.properties["orbitSpeed"] for body in self.bodies], dtype=np.float64)
+        self.dirty = False
+
+    @staticmethod
+    def Place(body, t):
+        # On demand evaluation of a single body
+        properties = body.properties
+        angle = properties["orbitPhase"] + properties["orbitSpeed"] * t
+        properties["position"][:] = OrbitPositions(properties["orbitCenter"], [properties["orbitRadius"]], angle)[0]
+        properties["rotation"][2] = angle
+
+    def Select(self, eye, forward, half_angle, near_range):
+        # Bodies whose orbit sphere is within near_range of the eye or inside the view cone
+        offsets = self.centers - eye
+        distance = np.linalg.norm(offsets, axis=1)
+        reach = self.radii + self.body_radius
+        near = distance - reach <= near_range
+        # Sphere against cone: the angle to the center minus the angle the sphere covers
+        along = offsets @ forward
+        cos_angle = along / np.maximum(distance, 1e-9)
+        sphere_angle = np.arcsin(np.clip(reach / np.maximum(distance, 1e-9), 0.0, 1.0))
+        visible = np.arccos(np.clip(cos_angle, -1.0, 1.0)) - sphere_angle <= half_angle
+        return np.flatnonzero(near | visible)
+
+    def Update(self, bodies, t, eye, forward, half_angle, near_range):
+        # Writes position and spin only for the selected bodies, returns how many were placed
+        if self.dirty:
+            self.Rebuild(bodies)
+        if not self.bodies:
+            return 0
+        selected = self.Select(np.asarray(eye, dtype=np.float64), np.asarray(forward, dtype=np.float64),
+                               half_angle, near_range)
+        angles = OrbitAngles(self.phases[selected], self.speeds[selected], t)
+        positions = OrbitPositions(self.centers[selected], self.radii[selected], angles)
+        for i, index in enumerate(selected):
+            properties = self.bodies[index].properties
+            properties["position"][:] = positions[i]
+            properties["rotation"][2] = angles[i]
+        return len(selected)
@@ -0,0 +1,126 @@
+#profiler.py
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+class Profiler:
+    def __init__(self, history=300, sync=None):
+        # Keeps the per-section CPU times of the last `history` frames.
+        # `sync` is called at the end of every section when set (e.g. glFinish) so that
+        # GL work is charged to the section that issued it.
+        # `gpu` (a GPUTimer) also times sections opened with gpu=True on the GPU, without
+        # stalling; its results arrive a few frames late.
+        self.history = history
+        self.sync = sync
+        self.enabled = True
+        self.frames = deque(maxlen=history)
+        self.values = deque(maxlen=history)
+        self.current = {}
+        self.currentValues = {}
+        self.frameStart = None
+        self.gpu = None
+
+    def BeginFrame(self):
+        if self.gpu is not None and self.enabled:
+            self.gpu.BeginFrame()
+        self.current = {}
+        self.currentValues = {}
+        self.frameStart = time.perf_counter()
+
+    def EndFrame(self):
+        if self.frameStart is None:
+            return
+        self.current["frame"] = time.perf_counter() - self.frameStart
+        self.frames.append(self.current)
+        self.values.append(self.currentValues)
+        self.frameStart = None
+
+    @contextmanager
+    def Section(self, name, gpu=False):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            if gpu and self.gpu is not None:
+                with self.gpu.Section(name):
+                    yield
+            else:
+                yield
+        finally:
+            if self.sync is not None:
+                self.sync()
+            self.Record(name, time.perf_counter() - start)
+
+    def Record(self, name, seconds):
+        # Sections hit several times in a frame add up
+        self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def Set(self, name, value):
+        # Non-timing per-frame values (counters, scales, ...)
+        self.currentValues[name] = value
+
+    def Values(self):
+        # Latest, mean, min and max of every value over the history
+        summary = {}
+        names = []
+        for values in self.values:
+            for name in values:
+                if name not in names:
+                    names.append(name)
+        for name in names:
+            samples = np.array([values[name] for values in self.values if name in values], dtype=np.float64)
+            summary[name] = {
+                "last": float(samples[-1]),
+                "mean": float(samples.mean()),
+                "min": float(samples.min()),
+                "max": float(samples.max()),
+            }
+        return summary
+
+    def Clear(self):
+        self.frames.clear()
+        self.values.clear()
+        if self.gpu is not None:
+            self.gpu.Clear()
+
+    def Names(self):
+        names = []
+        for frame in self.frames:
+            for name in frame:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def Samples(self, name):
+        return np.array([frame.get(name, 0.0) for frame in self.frames], dtype=np.float64)
+
+    def Averages(self):
+        # Mean milliseconds per frame for every section
+        return {name: 1000.0 * float(self.Samples(name).mean()) for name in self.Names()}
+
+    def Summary(self):
+        summary = {}
+        for name in self.Names():
+            samples = 1000.0 * self.Samples(name)
+            summary[name] = {
+                "mean_ms": float(samples.mean()),
+                "p50_ms": float(np.percentile(samples, 50)),
+                "p95_ms": float(np.percentile(samples, 95)),
+                "max_ms": float(samples.max()),
+            }
+        return summary
+
+    def Export(self, path):
+        report = {
+            "frames": len(self.frames),
+            "summary": self.Summary(),
+            "values": self.Values(),
+            "gpu_summary": self.gpu.Summary() if self.gpu is not None else {},
+            "history_ms": [{name: 1000.0 * value for name, value in frame.items()} for frame in self.frames],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,96 @@
+#replay.py
+import atexit
+import struct
+import numpy as np
+from utils.input import INPUT_KEYS, PackButtons, UnpackButtons, EdgeDetector
+
+# Input logs: the seed, window size and starting screen, then one fixed-size record per frame
+# with the held keys and buttons as a bitmask, the masks of those pressed and released since
+# the previous frame (a click within one frame is in both), the mouse delta, the cursor
+# position (ImGui menus are clicked with it) and the frame's time and delta time. Times and
+# mouse deltas are kept at full precision, so feeding the records back into Game.ProcessFrame
+# replays the session exactly, on screen or headless.
+#
+# Layout (little endian):
+#   header  magic "SHRL", version u16, key count u16, seed i64, width u32, height u32,
+#           start screen u8, key names (u16 length + comma separated ASCII)
+#   frames  FRAME_DTYPE records until the end of the file
+
+MAGIC = b"SHRL"
+VERSION = 2
+HEADER = struct.Struct("<4sHHqIIB")
+FRAME_DTYPE = np.dtype([("buttons", "<u4"), ("pressed", "<u4"), ("released", "<u4"),
+                        ("mouse", "<f8", 2), ("cursor", "<f4", 2), ("time", "<f8"), ("dt", "<f8")])
+
+class Recorder:
+    def __init__(self, path, seed, width, height, screen=0, flush_every=600):
+        self.file = open(path, "wb")
+        names = ",".join(INPUT_KEYS).encode("ascii")
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(INPUT_KEYS), seed, width, height, screen))
+        self.file.write(struct.pack("<H", len(names)) + names)
+        self.pending = np.zeros(flush_every, dtype=FRAME_DTYPE)
+        self.count = 0
+        self.frames = 0
+        self.edges = EdgeDetector()  # for inputs that come without edges (scripted scenes)
+        atexit.register(self.Close) # the menu's Exit button leaves through exit()
+
+    def Record(self, inputs, time):
+        record = self.pending[self.count]
+        record["buttons"] = PackButtons(inputs)
+        edges = self.edges.Update(dict(inputs))
+        record["pressed"] = edges["pressed"]
+        record["released"] = edges["released"]
+        record["mouse"] = inputs.get("mouseDelta", (0.0, 0.0))
+        record["cursor"] = inputs.get("cursor_pos", (0.0, 0.0))
+        record["time"] = time["currentTime"]
+        record["dt"] = time["deltaTime"]
+        self.count += 1
+        self.frames += 1
+        if self.count == len(self.pending):
+            self.Flush()
+
+    def Flush(self):
+        self.file.write(self.pending[:self.count].tobytes())
+        self.file.flush()
+        self.count = 0
+
+    def Close(self):
+        if self.file.closed:
+            return
+        self.Flush()
+        self.file.close()
+
+class InputLog:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, n_keys, self.seed, self.width, self.height, self.screen = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} input log")
+        offset = HEADER.size
+        (length,) = struct.unpack_from("<H", data, offset)
+        self.keys = tuple(data[offset + 2:offset + 2 + length].decode("ascii").split(","))
+        offset += 2 + length
+        usable = (len(data) - offset) // FRAME_DTYPE.itemsize * FRAME_DTYPE.itemsize
+        self.frames = np.frombuffer(data, dtype=FRAME_DTYPE, count=usable // FRAME_DTYPE.itemsize, offset=offset)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def Frame(self, index):
+        # The inputs and time dicts Window.StartFrame produced for this frame
+        record = self.frames[index]
+        inputs = UnpackButtons(int(record["buttons"]), self.keys)
+        # Edge masks are in the log's key order, Pressed() / Released() expect INPUT_KEYS order
+        inputs["pressed"] = PackButtons(UnpackButtons(int(record["pressed"]), self.keys))
+        inputs["released"] = PackButtons(UnpackButtons(int(record["released"]), self.keys))
+        inputs["mouseDelta"] = [float(record["mouse"][0]), float(record["mouse"][1])]
+        inputs["cursor_pos"] = (float(record["cursor"][0]), float(record["cursor"][1]))
+        return inputs, {"currentTime": float(record["time"]), "deltaTime": float(record["dt"])}
+
+def ApplyToImGui(inputs):
+    # ImGui reads the mouse itself, replays have to set it for the menu buttons
+    import imgui
+    io = imgui.get_io()
+    io.mouse_pos = inputs["cursor_pos"]
+    io.mouse_down[0] = inputs.get("L_CLICK", False)
@@ -0,0 +1,83 @@
+#resolution.py
+import numpy as np
+from OpenGL.GL import *
+from utils.graphics import Framebuffer
+
+# Dynamic resolution: the 3D scene is rendered into an offscreen target at `scale` times the
+# window size and stretched onto the window before the HUD, which stays at native resolution.
+# The target is allocated once at max_scale, smaller scales only shrink the viewport.
+
+class DynamicResolution:
+    def __init__(self, width, height, target_ms=1000.0 / 60.0, min_scale=0.5, max_scale=1.0,
+                 step=0.1, hysteresis=0.15, patience=30, adaptive=True):
+        self.width = width
+        self.height = height
+        self.target_ms = target_ms
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.hysteresis = hysteresis  # no change while within target_ms * (1 +- hysteresis)
+        self.patience = patience      # frames outside the band before the scale moves
+        self.adaptive = adaptive      # False keeps the scale fixed (benchmarks, screenshots)
+        self.scale = max_scale
+        self.smoothed_ms = None
+        self.overBudget = 0
+        self.underBudget = 0
+        self.target = Framebuffer(int(np.ceil(width * max_scale)), int(np.ceil(height * max_scale)))
+        self.previousFramebuffer = 0
+        self.previousViewport = (0, 0, width, height)
+
+    def ScaledSize(self):
+        return max(1, int(round(self.width * self.scale))), max(1, int(round(self.height * self.scale)))
+
+    def SetScale(self, scale):
+        self.scale = float(np.clip(scale, self.min_scale, self.max_scale))
+
+    def Update(self, frame_ms):
+        # Feed the measured frame time, returns the scale for the next frame
+        if not self.adaptive:
+            return self.scale
+        if self.smoothed_ms is None:
+            self.smoothed_ms = frame_ms
+        self.smoothed_ms += 0.1 * (frame_ms - self.smoothed_ms)
+
+        if self.smoothed_ms > self.target_ms * (1.0 + self.hysteresis):
+            self.overBudget += 1
+            self.underBudget = 0
+        elif self.smoothed_ms < self.target_ms * (1.0 - self.hysteresis):
+            self.underBudget += 1
+            self.overBudget = 0
+        else:
+            self.overBudget = 0
+            self.underBudget = 0
+
+        if self.overBudget >= self.patience and self.scale > self.min_scale:
+            self.SetScale(self.scale - self.step)
+            self.overBudget = 0
+        elif self.underBudget >= self.patience and self.scale < self.max_scale:
+            self.SetScale(self.scale + self.step)
+            self.underBudget = 0
+        return self.scale
+
+    def Begin(self, clear_color=(0.0, 0.0, 0.0, 1.0)):
+        # Redirect the scene into the scaled target
+        self.previousFramebuffer = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        self.previousViewport = tuple(glGetIntegerv(GL_VIEWPORT))
+        width, height = self.ScaledSize()
+        glBindFramebuffer(GL_FRAMEBUFFER, self.target.ID)
+        glViewport(0, 0, width, height)
+        glClearColor(*clear_color)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    def End(self):
+        # Upscale onto whatever was bound before Begin, then restore it
+        width, height = self.ScaledSize()
+        x, y, w, h = self.previousViewport
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.target.ID)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.previousFramebuffer)
+        glBlitFramebuffer(0, 0, width, height, x, y, x + w, y + h, GL_COLOR_BUFFER_BIT, GL_LINEAR)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.previousFramebuffer)
+        glViewport(x, y, w, h)
+
+    def Delete(self):
+        self.target.Delete()
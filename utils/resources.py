@@ -0,0 +1,90 @@
+#resources.py
+from collections import Counter
+from OpenGL.GL import *
+from utils import runtime
+
+# Reference counted GL objects. Every VBO, IBO, VAO, Shader, Framebuffer and GPUTimer registers
+# itself on creation holding one reference for its creator. Release() only queues an
+# object once nobody references it; the queue is deleted in one batch per GL object type
+# at frame end (Flush), when nothing drawn this frame can still be using it.
+
+def DeletePrograms(count, ids):
+    for program in ids:
+        glDeleteProgram(program)
+
+DELETERS = {
+    "buffer": glDeleteBuffers,
+    "vertex_array": glDeleteVertexArrays,
+    "program": DeletePrograms,
+    "framebuffer": glDeleteFramebuffers,
+    "texture": glDeleteTextures,
+    "renderbuffer": glDeleteRenderbuffers,
+    "query": glDeleteQueries,
+}
+
+class ResourceManager:
+    def __init__(self):
+        self.refs = {}      # id(resource) -> [resource, references]
+        self.pending = {}   # id(resource) -> resource, released and waiting for Flush
+        self.deleted = Counter()
+
+    def Track(self, resource):
+        self.refs[id(resource)] = [resource, 1]
+        return resource
+
+    def Retain(self, resource):
+        entry = self.refs.get(id(resource))
+        if entry is not None:
+            entry[1] += 1
+            self.pending.pop(id(resource), None)
+
+    def Release(self, resource):
+        entry = self.refs.get(id(resource))
+        if entry is None:
+            return
+        if entry[1] <= 0:
+            # More releases than references: somebody released twice, deleting now could
+            # pull the object from under its remaining users
+            runtime.Log(f"Release: {type(resource).__name__} released more often than retained, ignored")
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            self.pending[id(resource)] = resource
+
+    def References(self, resource):
+        entry = self.refs.get(id(resource))
+        return entry[1] if entry is not None else 0
+
+    def Forget(self, resource):
+        # Called by Delete(), the object is gone already
+        self.refs.pop(id(resource), None)
+        self.pending.pop(id(resource), None)
+
+    def Flush(self):
+        # Deletes everything released since the last flush, one GL call per object type
+        if not self.pending:
+            return 0
+        handles = {}
+        for resource in self.pending.values():
+            self.refs.pop(id(resource), None)
+            self.deleted[type(resource).__name__] += 1
+            for kind, handle in resource.Handles():
+                handles.setdefault(kind, []).append(int(handle))
+        count = len(self.pending)
+        self.pending = {}
+        for kind, ids in handles.items():
+            DELETERS[kind](len(ids), ids)
+        return count
+
+    def Counts(self):
+        # Live objects per class and GL names per GL object type
+        live = Counter()
+        names = Counter()
+        for resource, _ in self.refs.values():
+            live[type(resource).__name__] += 1
+            for kind, _ in resource.Handles():
+                names[kind] += 1
+        return {"objects": dict(live), "gl_names": dict(names), "pending": len(self.pending),
+                "deleted": dict(self.deleted)}
+
+manager = ResourceManager()
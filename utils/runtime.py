@@ -0,0 +1,116 @@
+#runtime.py
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Runtime profiles. Configure() must run before anything imports OpenGL, since PyOpenGL
+# reads its error checking and logging flags when OpenGL.GL is first imported.
+#
+# The profile comes from SPACE_HEIST_PROFILE, or from a JSON config file
+# (SPACE_HEIST_CONFIG, default runtime.json next to main.py) such as
+#   {"profile": "production", "startup_trace": true}
+# where any profile option can also be overridden.
+
+PROCESS_START = time.perf_counter()
+
+PROFILES = {
+    "development": {
+        "gl_error_checking": True,
+        "gl_logging": False,
+        "debug_prints": True,
+        "startup_trace": True,
+        "memory_trace": True,
+        "job_workers": None,  # update job threads, None = one per core (at most 4), 1 = inline
+        "gpu_timers": True,  # GL_TIME_ELAPSED queries around the draw passes
+        "gl_stats": False,  # count GL calls per frame (debug panel), costs a Python call per GL call
+        "shading": "auto",  # "full", "vertex", "unlit" or "auto" (by distance), see Game.shadingTiers
+        "occlusion_culling": True,  # skip stations and pirates hidden behind planets (GL queries)
+    },
+    "production": {
+        "gl_error_checking": False,
+        "gl_logging": False,
+        "debug_prints": False,
+        "startup_trace": False,
+        "memory_trace": False,
+        "job_workers": None,
+        "gpu_timers": False,
+        "gl_stats": False,
+        "shading": "auto",
+        "occlusion_culling": True,
+    },
+}
+DEFAULT_PROFILE = "development"
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runtime.json")
+
+profile = DEFAULT_PROFILE
+options = dict(PROFILES[DEFAULT_PROFILE])
+
+def LoadConfig(path=None):
+    path = path or os.environ.get("SPACE_HEIST_CONFIG", DEFAULT_CONFIG)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def Configure(name=None, config_path=None):
+    # Picks the profile (argument > environment > config file > default) and applies it
+    global profile, options
+    config = LoadConfig(config_path)
+    name = name or os.environ.get("SPACE_HEIST_PROFILE") or config.get("profile") or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown runtime profile '{name}', expected one of {sorted(PROFILES)}")
+    profile = name
+    options = dict(PROFILES[name])
+    options.update({key: value for key, value in config.items() if key in options})
+
+    import OpenGL
+    OpenGL.ERROR_CHECKING = options["gl_error_checking"]
+    OpenGL.ERROR_LOGGING = options["gl_logging"]
+    return options
+
+def Log(*args, **kwargs):
+    # Debug output, silent in production
+    if options["debug_prints"]:
+        print(*args, **kwargs)
+
+class StartupTrace:
+    def __init__(self):
+        self.spans = []
+        self.milestones = []
+
+    @contextmanager
+    def Span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.Record(name, time.perf_counter() - start)
+
+    def Record(self, name, seconds):
+        for span in self.spans:
+            if span["name"] == name:
+                span["ms"] += 1000.0 * seconds
+                return
+        self.spans.append({"name": name, "ms": 1000.0 * seconds})
+
+    def Milestone(self, name):
+        # Time since the import of this module, recorded (and reported) once per name
+        if any(milestone["name"] == name for milestone in self.milestones):
+            return
+        self.milestones.append({"name": name, "ms": 1000.0 * (time.perf_counter() - PROCESS_START)})
+        if options["startup_trace"]:
+            print(self.Report())
+
+    def Summary(self):
+        return {"profile": profile, "spans": list(self.spans), "milestones": list(self.milestones)}
+
+    def Report(self):
+        lines = [f"Startup trace ({profile} profile)"]
+        for span in self.spans:
+            lines.append(f"  {span['name']:20s} {span['ms']:9.2f} ms")
+        for milestone in self.milestones:
+            lines.append(f"  {milestone['name']:20s} {milestone['ms']:9.2f} ms after start")
+        return "\n".join(lines)
+
+trace = StartupTrace()
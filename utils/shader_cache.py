@@ -0,0 +1,87 @@
+#shader_cache.py
+import ctypes
+import hashlib
+import os
+import struct
+from OpenGL.GL import *
+
+# Linked program binaries are cached on disk, keyed by the GLSL sources and the driver
+# strings. Any problem (no support, stale or corrupt file, driver update) silently falls
+# back to compiling from source.
+
+CACHE_DIR = os.environ.get("SPACE_HEIST_SHADER_CACHE",
+                           os.path.join(os.path.expanduser("~"), ".cache", "space_heist", "shaders"))
+enabled = os.environ.get("SPACE_HEIST_SHADER_CACHE_DISABLE", "") == ""
+
+def Supported():
+    try:
+        return bool(glGetProgramBinary) and bool(glProgramBinary) and glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+    except Exception:
+        return False
+
+def CacheKey(*sources):
+    digest = hashlib.sha256()
+    for value in (GL_VENDOR, GL_RENDERER, GL_VERSION):
+        digest.update(glGetString(value) or b"")
+        digest.update(b"\0")
+    for source in sources:
+        digest.update(source.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def CachePath(key):
+    return os.path.join(CACHE_DIR, key + ".bin")
+
+def Load(key):
+    # Returns a linked program ID, or None when there is no usable binary
+    if not enabled or not Supported():
+        return None
+    try:
+        with open(CachePath(key), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < 4:
+        return None
+    binary_format, = struct.unpack("<I", data[:4])
+    binary = data[4:]
+
+    program = glCreateProgram()
+    linked = False
+    try:
+        glProgramBinary(program, binary_format, binary, len(binary))
+        linked = glGetProgramiv(program, GL_LINK_STATUS) == GL_TRUE
+    except Exception:
+        pass
+    finally:
+        if not linked:
+            glDeleteProgram(program)
+    if linked:
+        return program
+    # Rejected by the driver (usually after an update): drop it and recompile
+    try:
+        os.remove(CachePath(key))
+    except OSError:
+        pass
+    return None
+
+def Store(key, program):
+    if not enabled or not Supported():
+        return
+    try:
+        length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+        if length <= 0:
+            return
+        binary = (ctypes.c_ubyte * length)()
+        written = GLsizei(0)
+        binary_format = GLenum(0)
+        glGetProgramBinary(program, length, ctypes.byref(written), ctypes.byref(binary_format), binary)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write then rename so a crash never leaves a truncated binary behind
+        path = CachePath(key)
+        with open(path + ".tmp", "wb") as f:
+            f.write(struct.pack("<I", binary_format.value))
+            f.write(bytes(binary)[:written.value])
+        os.replace(path + ".tmp", path)
+    except Exception:
+        pass
@@ -0,0 +1,109 @@
+#starfield.py
+import numpy as np
+from OpenGL.GL import *
+from utils.graphics import VBO, VAO
+
+# Default star layers. Layer 0 is a sky sphere that only follows the camera rotation,
+# the others are cubes of stars that wrap around the camera and drift with parallax.
+DEFAULT_LAYERS = [
+    {"fraction": 0.7, "extent": 0.0, "parallax": 0.0, "size": (1.0, 2.5)},
+    {"fraction": 0.2, "extent": 4000.0, "parallax": 0.05, "size": (1.5, 3.0)},
+    {"fraction": 0.1, "extent": 1500.0, "parallax": 0.2, "size": (2.0, 4.0)},
+]
+MAX_LAYERS = 4  # Must match the uniform arrays in star_shader
+
+class Starfield:
+    def __init__(self, shader, n_stars=60000, layers=None, seed=0):
+        self.shader = shader
+        self.layers = layers if layers is not None else DEFAULT_LAYERS
+        if len(self.layers) > MAX_LAYERS:
+            raise ValueError(f"Starfield supports at most {MAX_LAYERS} layers")
+
+        data = self.Generate(n_stars, self.layers, seed)
+        self.num_stars = len(data)
+        self.vbo = VBO(data)
+        self.vao = VAO(self.vbo, 9)
+
+        # Uniform locations never change, so look them up once
+        self.shader.Use()
+        self.viewMatrixLocation = glGetUniformLocation(self.shader.ID, "viewMatrix".encode('utf-8'))
+        self.projectionMatrixLocation = glGetUniformLocation(self.shader.ID, "projectionMatrix".encode('utf-8'))
+        self.layerOffsetLocation = glGetUniformLocation(self.shader.ID, "layerOffset".encode('utf-8'))
+        self.layerExtentLocation = glGetUniformLocation(self.shader.ID, "layerExtent".encode('utf-8'))
+
+        extents = np.zeros(MAX_LAYERS, dtype=np.float32)
+        for i, layer in enumerate(self.layers):
+            extents[i] = layer["extent"]
+        self.layerExtents = extents
+        glUniform1fv(self.layerExtentLocation, MAX_LAYERS, extents)
+
+    @staticmethod
+    def Generate(n_stars, layers, seed):
+        # Build the interleaved (position, color, size, layer) array for every star in one go
+        rng = np.random.default_rng(seed)
+        fractions = np.array([layer["fraction"] for layer in layers], dtype=np.float64)
+        counts = rng.multinomial(n_stars, fractions / fractions.sum())
+
+        chunks = []
+        for i, (layer, count) in enumerate(zip(layers, counts)):
+            if count == 0:
+                continue
+            if layer["extent"] > 0.0:
+                half = 0.5 * layer["extent"]
+                positions = rng.uniform(-half, half, size=(count, 3))
+            else:
+                # Uniform directions on the unit sphere
+                positions = rng.normal(size=(count, 3))
+                positions /= np.linalg.norm(positions, axis=1, keepdims=True)
+
+            # Mostly white stars with a slight blue or yellow tint
+            tint = rng.uniform(-1.0, 1.0, size=(count, 1))
+            colors = np.empty((count, 4))
+            colors[:, 0:1] = 1.0 - 0.25 * np.clip(-tint, 0.0, 1.0)
+            colors[:, 1:2] = 1.0 - 0.1 * np.abs(tint)
+            colors[:, 2:3] = 1.0 - 0.35 * np.clip(tint, 0.0, 1.0)
+            colors[:, 3] = 0.15 + 0.85 * rng.uniform(0.0, 1.0, size=count) ** 3  # brightness, mostly faint
+
+            sizes = rng.uniform(layer["size"][0], layer["size"][1], size=(count, 1))
+            layer_ids = np.full((count, 1), i)
+            chunks.append(np.hstack([positions, colors, sizes, layer_ids]))
+
+        if not chunks:
+            return np.zeros((0, 9), dtype=np.float32)
+        return np.ascontiguousarray(np.vstack(chunks), dtype=np.float32)
+
+    def Draw(self, camera):
+        if self.num_stars == 0:
+            return
+        self.shader.Use()
+
+        # The stars only rotate with the camera, the translation is handled per layer
+        glUniformMatrix4fv(self.viewMatrixLocation, 1, GL_TRUE, camera.viewRotation)
+        glUniformMatrix4fv(self.projectionMatrixLocation, 1, GL_TRUE, camera.projectionMatrix)
+
+        # Wrap the parallax offsets in float64 so they stay precise far from the origin
+        position = np.asarray(camera.position, dtype=np.float64)
+        offsets = np.zeros((MAX_LAYERS, 3), dtype=np.float32)
+        for i, layer in enumerate(self.layers):
+            if layer["extent"] > 0.0:
+                offsets[i] = np.mod(position * layer["parallax"], layer["extent"])
+        glUniform3fv(self.layerOffsetLocation, MAX_LAYERS, offsets)
+
+        # Behind everything: no depth test or writes, additive blending
+        glDisable(GL_DEPTH_TEST)
+        glDepthMask(GL_FALSE)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+        glEnable(GL_PROGRAM_POINT_SIZE)
+
+        self.vao.Use()
+        glDrawArrays(GL_POINTS, 0, self.num_stars)
+
+        glDisable(GL_PROGRAM_POINT_SIZE)
+        glDisable(GL_BLEND)
+        glDepthMask(GL_TRUE)
+        glEnable(GL_DEPTH_TEST)
+
+    def Delete(self):
+        self.vao.Delete()
+        self.vbo.Delete()
@@ -1,7 +1,7 @@
 import glfw
 from OpenGL.GL import *
 import imgui
-from imgui.integrations.glfw import GlfwRenderer
+from utils.input import Input, UnpackButtons
 
 class Window:
     def __init__(self):
@@ -37,9 +37,12 @@ class Window:
         glfw.set_window_pos(self.window, 0, 30) 
         glfw.make_context_current(self.window)
         
-        # Initialize ImGUI
+        # Initialize ImGUI (the GLFW integration is only imported once a window exists)
+        from imgui.integrations.glfw import GlfwRenderer
         imgui.create_context()
         self.impl = GlfwRenderer(self.window)
+        self.input = Input(glfw, self.window)
+        self.InstallActivityCallbacks()
 
         # Enable Depth and blending
         glEnable(GL_DEPTH_TEST)
@@ -52,6 +55,37 @@ class Window:
         # Delta time
         self.prevTime = glfw.get_time()
 
+    def InstallActivityCallbacks(self):
+        # Chain onto the ImGui callbacks: any event marks the window as needing a redraw,
+        # key, button and cursor events also feed the input state
+        self.activity = True
+        def chain(setter, handler=None):
+            previous = None
+            def callback(*args):
+                self.activity = True
+                if handler is not None:
+                    handler(*args)
+                if previous is not None:
+                    previous(*args)
+            previous = setter(self.window, callback)
+        chain(glfw.set_key_callback, self.input.OnKey)
+        chain(glfw.set_char_callback)
+        chain(glfw.set_cursor_pos_callback, self.input.OnCursor)
+        chain(glfw.set_mouse_button_callback, self.input.OnMouseButton)
+        chain(glfw.set_scroll_callback)
+        chain(glfw.set_window_size_callback)
+        chain(glfw.set_window_refresh_callback)
+        chain(glfw.set_window_focus_callback)
+
+    def WaitForActivity(self, timeout):
+        # Sleeps in glfw until an event arrives or the timeout expires.
+        # Returns True if anything happened since the last call.
+        if not self.activity:
+            glfw.wait_events_timeout(timeout)
+        activity = self.activity
+        self.activity = False
+        return activity
+
     def Close(self):
         self.impl.shutdown()
         glfw.terminate()
@@ -66,53 +100,25 @@ class Window:
         time = {"currentTime" : currentTime, "deltaTime" : deltaTime}
 
         glfw.poll_events()
-        
-        inputs = {
-            "1":False,
-            "W":False,
-            "S":False,
-            "A":False,
-            "D":False,
-            "Q":False,
-            "E":False,
-            "SPACE":False,
-            "L_SHIFT":False,
-            "R_CLICK":False,
-            "L_CLICK":False,
-            "V": False,  # Add the V key for view toggle
-            "mouseDelta": [0.0,0.0] # Get mouse offset from center per frame
-            }
-        
-        if glfw.get_key(self.window, glfw.KEY_1) == glfw.PRESS:
-            inputs["1"] = True
-        if glfw.get_key(self.window, glfw.KEY_W) == glfw.PRESS:
-            inputs["W"] = True
-        if glfw.get_key(self.window, glfw.KEY_A) == glfw.PRESS:
-            inputs["A"] = True
-        if glfw.get_key(self.window, glfw.KEY_S) == glfw.PRESS:
-            inputs["S"] = True
-        if glfw.get_key(self.window, glfw.KEY_D) == glfw.PRESS:
-            inputs["D"] = True
-        if glfw.get_key(self.window, glfw.KEY_Q) == glfw.PRESS:
-            inputs["Q"] = True
-        if glfw.get_key(self.window, glfw.KEY_E) == glfw.PRESS:
-            inputs["E"] = True
-        if glfw.get_key(self.window, glfw.KEY_SPACE) == glfw.PRESS:
-            inputs["SPACE"] = True
-        if glfw.get_key(self.window, glfw.KEY_LEFT_SHIFT) == glfw.PRESS:
-            inputs["L_SHIFT"] = True
-        if glfw.get_mouse_button(self.window, glfw.MOUSE_BUTTON_RIGHT) == glfw.PRESS:
-            inputs["R_CLICK"] = True
-        if glfw.get_mouse_button(self.window, glfw.MOUSE_BUTTON_LEFT) == glfw.PRESS:
-            inputs["L_CLICK"] = True
-        if glfw.get_key(self.window, glfw.KEY_V) == glfw.PRESS:  # Check for V key press
-            inputs["V"] = True
-
-        xpos, ypos = glfw.get_cursor_pos(self.window)
+
+        # Button state comes from the callbacks run by poll_events, nothing is polled here
+        held, pressed, released, events = self.input.Frame()
+        inputs = UnpackButtons(held)
+        inputs["pressed"] = pressed
+        inputs["released"] = released
+        # Seconds since the oldest event of this frame was delivered (e.g. while the
+        # menus wait for activity)
+        inputs["latency"] = glfw.get_time() - events[0][0] if events else 0.0
+        inputs["events"] = len(events)
+        xpos, ypos = self.input.cursor
         inputs["mouseDelta"] = [xpos - self.windowWidth/2, ypos - self.windowHeight/2]
         # Store absolute cursor position.
         inputs["cursor_pos"] = (xpos, ypos)
         self.impl.process_inputs()
+        # ImGui polls the buttons itself, give it the latched state so short clicks count
+        io = imgui.get_io()
+        io.mouse_down[0] = inputs["L_CLICK"]
+        io.mouse_down[1] = inputs["R_CLICK"]
 
         glClearColor(c0, c1, c2, c3)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
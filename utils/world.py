@@ -0,0 +1,180 @@
+#world.py
+import numpy as np
+
+# The galaxy is cut into cubic sectors. The content of a sector is a pure function of
+# (seed, sector key), so sectors can be created and thrown away at will and always
+# come back identical.
+#
+# A bounded galaxy is generated up front in one pass from a single np.random.Generator,
+# every sector at once as flat arrays; Generate(key) then only slices them. An unbounded
+# galaxy runs the same bulk code on one sector at a time, seeded from (seed, key).
+#
+# With min_separation > 0 each sector is cut into cells at least twice that wide, a cell holds
+# at most one planet and planets keep min_separation / 2 away from the cell walls, so no two
+# planets (with their orbiting stations) come closer than min_separation while still being
+# jittered over the middle of their cell. A planet drawn into an occupied cell is moved to
+# another free cell of its sector.
+
+SEED_OFFSET = 2**31  # SeedSequence only takes non-negative entropy
+
+class SectorGrid:
+    def __init__(self, seed, sector_size=2500.0, planets_per_sector=0.3, pirates_per_sector=0.3,
+                 n_palettes=16, bounds=None, min_separation=250.0):
+        self.seed = seed
+        self.sector_size = sector_size
+        self.planets_per_sector = planets_per_sector
+        self.pirates_per_sector = pirates_per_sector
+        self.n_palettes = n_palettes
+        self.min_separation = min(min_separation, sector_size)
+        self.cells = max(1, int(sector_size // (2 * self.min_separation))) if self.min_separation > 0 else 0
+        # Optional (min_key, max_key) pair of sector coordinates, None for an unbounded galaxy
+        self.bounds = bounds
+        self.bulk = None
+        if bounds is not None:
+            low, high = np.asarray(bounds[0]), np.asarray(bounds[1])
+            self.shape = tuple(int(n) for n in high - low + 1)
+            keys = low + np.stack(np.unravel_index(np.arange(np.prod(self.shape)), self.shape), axis=1)
+            self.bulk = self.GenerateSectors(keys, np.random.default_rng(seed))
+
+    def SectorOf(self, position):
+        return tuple(int(k) for k in np.floor(np.asarray(position, dtype=np.float64) / self.sector_size))
+
+    def InBounds(self, key):
+        if self.bounds is None:
+            return True
+        low, high = self.bounds
+        return all(low[i] <= key[i] <= high[i] for i in range(3))
+
+    def Rng(self, key, stream=0):
+        return np.random.default_rng([self.seed, stream] + [k + SEED_OFFSET for k in key])
+
+    def GenerateSectors(self, keys, rng):
+        # Content of many sectors at once. Bodies come out grouped by sector, in key order;
+        # planet_sector / pirate_sector index into keys.
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, 3)
+        size = self.sector_size
+        n_planets = rng.poisson(self.planets_per_sector, size=len(keys))
+        n_pirates = rng.poisson(self.pirates_per_sector, size=len(keys))
+
+        planet_sector = np.repeat(np.arange(len(keys)), n_planets)
+        if self.cells > 0:
+            k = self.cells
+            cell_size = size / k
+            # A sector cannot hold more planets than cells
+            n_planets = np.minimum(n_planets, k ** 3)
+            planet_sector = np.repeat(np.arange(len(keys)), n_planets)
+            cells = rng.integers(0, k, size=(len(planet_sector), 3))
+            while True:
+                # Planets in an occupied cell of their sector draw again
+                cell_ids = ((planet_sector * k + cells[:, 0]) * k + cells[:, 1]) * k + cells[:, 2]
+                taken = np.zeros(len(cell_ids), dtype=bool)
+                taken[np.unique(cell_ids, return_index=True)[1]] = True
+                if taken.all():
+                    break
+                cells[~taken] = rng.integers(0, k, size=(int((~taken).sum()), 3))
+            wall = 0.5 * self.min_separation
+            offsets = cells * cell_size + rng.uniform(wall, cell_size - wall, size=(len(planet_sector), 3))
+        else:
+            offsets = rng.uniform(0, size, size=(len(planet_sector), 3))
+
+        pirate_sector = np.repeat(np.arange(len(keys)), n_pirates)
+        directions = rng.normal(size=(len(pirate_sector), 3))
+        directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), 1e-9)
+        return {
+            "planet_sector": planet_sector,
+            "planet_positions": keys[planet_sector] * size + offsets,
+            "planet_palettes": rng.integers(0, self.n_palettes, size=len(planet_sector)),
+            "orbit_angles": rng.uniform(0, 2 * np.pi, size=len(planet_sector)),
+            "pirate_sector": pirate_sector,
+            "pirate_positions": keys[pirate_sector] * size + rng.uniform(0, size, size=(len(pirate_sector), 3)),
+            "pirate_velocities": directions,
+        }
+
+    def Generate(self, key):
+        # Describe everything living in a sector as arrays, ids are indices into them
+        if not self.InBounds(key):
+            return {
+                "planet_positions": np.zeros((0, 3)),
+                "planet_palettes": np.zeros(0, dtype=np.int64),
+                "orbit_angles": np.zeros(0),
+                "pirate_positions": np.zeros((0, 3)),
+                "pirate_velocities": np.zeros((0, 3)),
+            }
+        if self.bulk is not None:
+            bodies = self.bulk
+            index = np.ravel_multi_index(tuple(np.asarray(key) - np.asarray(self.bounds[0])), self.shape)
+        else:
+            bodies = self.GenerateSectors([key], self.Rng(key))
+            index = 0
+        planets = slice(*np.searchsorted(bodies["planet_sector"], [index, index + 1]))
+        pirates = slice(*np.searchsorted(bodies["pirate_sector"], [index, index + 1]))
+        return {
+            "planet_positions": bodies["planet_positions"][planets],
+            "planet_palettes": bodies["planet_palettes"][planets],
+            "orbit_angles": bodies["orbit_angles"][planets],
+            "pirate_positions": bodies["pirate_positions"][pirates],
+            "pirate_velocities": bodies["pirate_velocities"][pirates],
+        }
+
+    def FindPlanet(self, key, max_shells=8, exclude=()):
+        # Search shells of sectors around key for the nearest one holding a planet.
+        # Returns (sector key, planet index) or None.
+        for shell in range(max_shells + 1):
+            candidates = []
+            for dx in range(-shell, shell + 1):
+                for dy in range(-shell, shell + 1):
+                    for dz in range(-shell, shell + 1):
+                        if max(abs(dx), abs(dy), abs(dz)) != shell:
+                            continue
+                        candidates.append((key[0] + dx, key[1] + dy, key[2] + dz))
+            for candidate in sorted(candidates):
+                sector = self.Generate(candidate)
+                for i in range(len(sector["planet_positions"])):
+                    if (candidate, i) not in exclude:
+                        return candidate, i
+        return None
+
+class SectorStreamer:
+    def __init__(self, grid, radius=2, on_enter=None, on_exit=None):
+        self.grid = grid
+        self.radius = radius  # in sectors
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.center = None
+        self.resident = set()
+
+    def Wanted(self, center):
+        # Sectors whose centers lie within radius sectors of the center sector
+        wanted = set()
+        r = self.radius
+        for dx in range(-r, r + 1):
+            for dy in range(-r, r + 1):
+                for dz in range(-r, r + 1):
+                    if dx * dx + dy * dy + dz * dz > r * r:
+                        continue
+                    key = (center[0] + dx, center[1] + dy, center[2] + dz)
+                    if self.grid.InBounds(key):
+                        wanted.add(key)
+        return wanted
+
+    def Update(self, position):
+        # Only does work when the position crosses into another sector
+        center = self.grid.SectorOf(position)
+        if center == self.center:
+            return
+        self.center = center
+        wanted = self.Wanted(center)
+        for key in sorted(self.resident - wanted):
+            if self.on_exit is not None:
+                self.on_exit(key)
+        for key in sorted(wanted - self.resident):
+            if self.on_enter is not None:
+                self.on_enter(key, self.grid.Generate(key))
+        self.resident = wanted
+
+    def Clear(self):
+        for key in sorted(self.resident):
+            if self.on_exit is not None:
+                self.on_exit(key)
+        self.resident = set()
+        self.center = None